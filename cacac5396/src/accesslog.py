@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# ------ accesslog.py
+# one JSON line per request without slowing the handlers down
+# a handler only appends a tuple to a deque (no lock, no formatting, no file write);
+# a background thread takes everything that is there every FLUSH_INTERVAL, turns it into JSON lines
+# and writes them in one go. if the writer falls behind, new lines are dropped (counted) once
+# MAX_PENDING are waiting, instead of the server blocking or growing without limit
+# sample_rate < 1 keeps only part of the requests, the file is rotated at max_bytes (path.1, path.2 ...)
+
+import os
+import json
+import random
+import threading
+from collections import deque
+
+FLUSH_INTERVAL = 0.2     # seconds between writes when idle
+MAX_PENDING = 100000     # lines waiting to be written
+BATCH = 5000             # lines per write
+
+
+class AccessLog:
+    def __init__(self, path, sample_rate=1.0, max_bytes=64 << 20, backups=3):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pending = deque()   # append / popleft are thread safe without a lock
+        self.written = 0
+        self.dropped = 0
+        self.file = open(path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    # ----------- log : called by the handler, record = (ts, client, method, path, status, us, trace)
+    def log(self, record):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        if len(self.pending) >= MAX_PENDING:
+            self.dropped = self.dropped + 1  # only under overload, a race may miss a count
+            return
+        self.pending.append(record)
+
+    def _loop(self):
+        while not self.stop.is_set():
+            if len(self.pending) == 0:
+                self.stop.wait(FLUSH_INTERVAL)
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        lines = []
+        while len(lines) < BATCH:
+            try:
+                ts, client, method, path, status, us, trace = self.pending.popleft()
+            except IndexError:
+                break
+            out = {}
+            out["ts"] = round(ts, 6)
+            out["client"] = client
+            out["method"] = method
+            out["path"] = path
+            out["status"] = status
+            out["us"] = us
+            if trace is not None:
+                out["trace"] = trace
+            lines.append(json.dumps(out))
+        if len(lines) == 0:
+            return
+        text = "\n".join(lines) + "\n"
+        self.file.write(text)
+        self.file.flush()
+        self.size = self.size + len(text)
+        self.written = self.written + len(lines)
+        if self.size >= self.max_bytes:
+            self._rotate()
+
+    # ----------- _rotate : path -> path.1 -> path.2 ... (oldest over backups is removed)
+    def _rotate(self):
+        self.file.close()
+        i = self.backups
+        while i >= 1:
+            src = self.path if i == 1 else self.path + "." + str(i - 1)
+            dst = self.path + "." + str(i)
+            if os.path.exists(src):
+                os.replace(src, dst)
+            i = i - 1
+        if self.backups == 0:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = 0
+
+    # ----------- close : write what is left (server shutdown)
+    def close(self):
+        self.stop.set()
+        self.thread.join(timeout=5)
+        self.file.close()
+
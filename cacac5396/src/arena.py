@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# ------ arena.py
+# compact key/value store for many small values
+# a dict with str keys and values costs ~100+ bytes of python objects per entry on top of the payload,
+# here keys and values are raw utf-8 bytes packed in one big bytearray (the arena)
+# and the index is made of typed arrays (8 or 4 bytes per number, no object per entry)
+
+import threading
+from array import array
+
+EMPTY = -1       # hash table cell never used
+DELETED = -2     # hash table cell used before (keep probing past it)
+
+MIN_TABLE = 1024
+
+# compact when more than half of the arena is dead bytes (and the arena is not tiny)
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 1 << 20
+
+
+class ArenaStore:
+    def __init__(self):
+        self.data = bytearray()      # records: key bytes then value bytes
+        self.lock = threading.Lock()
+
+        # per slot (one slot = one live record), index = slot number
+        self.offs = array("Q")       # start of the record in data
+        self.klens = array("I")      # key length in bytes
+        self.vlens = array("I")      # value length in bytes
+        self.caps = array("I")       # bytes reserved for the record (>= klen + vlen)
+        self.hashes = array("I")     # low 32 bits of the key hash (skip byte compares on probe)
+        self.versions = array("Q")   # version of the value (server.py), 0 = none
+        self.free_slots = []         # slot numbers of deleted records
+
+        # open addressing hash table: cell -> slot number, EMPTY or DELETED
+        self.table = array("i", [EMPTY]) * MIN_TABLE  # 4 byte cells: up to 2^31 keys
+        self.used_cells = 0          # live + DELETED cells (decides when to grow)
+        self.count = 0
+
+        # dead space in data: record size -> list of offsets, reused by same size records
+        self.free_space = {}
+        self.garbage = 0
+
+    def __len__(self):
+        return self.count
+
+    # ----------- _find : (cell, slot) of key, slot = -1 if missing
+    # caller holds the lock
+    def _find(self, kb, h):
+        mask = len(self.table) - 1
+        cell = h & mask
+        first_free = -1
+        while True:
+            slot = self.table[cell]
+            if slot == EMPTY:
+                if first_free == -1:
+                    first_free = cell
+                return first_free, -1
+            if slot == DELETED:
+                if first_free == -1:
+                    first_free = cell
+            elif self.hashes[slot] == h & 0xFFFFFFFF and self.klens[slot] == len(kb):
+                off = self.offs[slot]
+                if self.data[off:off + len(kb)] == kb:
+                    return cell, slot
+            cell = (cell + 1) & mask
+
+    # ----------- _grow : double the table when it is more than half full
+    def _grow(self):
+        size = len(self.table) * 2
+        while self.count * 2 >= size:
+            size = size * 2
+        table = array("i", [EMPTY]) * size
+        mask = size - 1
+        for slot in self.table:
+            if slot >= 0:
+                cell = self.hashes[slot] & mask  # same cell as h & mask while the table has < 2^32 cells
+                while table[cell] != EMPTY:
+                    cell = (cell + 1) & mask
+                table[cell] = slot
+        self.table = table
+        self.used_cells = self.count
+
+    # ----------- _place : store key + value bytes, return the offset
+    # reuse a dead hole of the same size first, else append at the end of the arena
+    def _place(self, kb, vb):
+        size = len(kb) + len(vb)
+        holes = self.free_space.get(size)
+        if holes:
+            off = holes.pop()
+            self.garbage = self.garbage - size
+            end = off + len(kb)
+            self.data[off:end] = kb
+            self.data[end:end + len(vb)] = vb
+            return off
+        off = len(self.data)
+        self.data += kb
+        self.data += vb
+        return off
+
+    # ----------- _release : record of size bytes (used of them live) becomes a hole
+    # the unused tail (size - used) is already counted in garbage (see the in place update)
+    def _release(self, off, size, used):
+        holes = self.free_space.get(size)
+        if holes is None:
+            holes = []
+            self.free_space[size] = holes
+        holes.append(off)
+        self.garbage = self.garbage + used
+
+    def __setitem__(self, key, value):
+        self.put(key, value, 0)
+
+    # ----------- put : store value and its version (a plain number, kept in a typed array, no int object)
+    def put(self, key, value, version):
+        kb = key.encode("utf-8")
+        vb = value.encode("utf-8")
+        h = hash(kb)
+        size = len(kb) + len(vb)
+        with self.lock:
+            cell, slot = self._find(kb, h)
+
+            if slot >= 0:
+                # update: write in place if it fits, else move the record
+                old = len(kb) + self.vlens[slot]
+                if size <= self.caps[slot]:
+                    off = self.offs[slot]
+                    self.data[off + len(kb):off + size] = vb
+                    self.vlens[slot] = len(vb)
+                    self.versions[slot] = version
+                    self.garbage = self.garbage + old - size  # a shorter value leaves dead bytes behind it
+                    self._maybe_compact()
+                    return
+                self._release(self.offs[slot], self.caps[slot], old)
+                off = self._place(kb, vb)
+                self.offs[slot] = off
+                self.vlens[slot] = len(vb)
+                self.caps[slot] = size
+                self.versions[slot] = version
+                self._maybe_compact()
+                return
+
+            # new key
+            off = self._place(kb, vb)
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.offs[slot] = off
+                self.klens[slot] = len(kb)
+                self.vlens[slot] = len(vb)
+                self.caps[slot] = size
+                self.hashes[slot] = h & 0xFFFFFFFF
+                self.versions[slot] = version
+            else:
+                slot = len(self.offs)
+                self.offs.append(off)
+                self.klens.append(len(kb))
+                self.vlens.append(len(vb))
+                self.caps.append(size)
+                self.hashes.append(h & 0xFFFFFFFF)
+                self.versions.append(version)
+
+            if self.table[cell] == EMPTY:
+                self.used_cells = self.used_cells + 1
+            self.table[cell] = slot
+            self.count = self.count + 1
+            if self.used_cells * 2 > len(self.table):
+                self._grow()
+
+    def update(self, items):
+        for key in items:
+            self[key] = items[key]
+
+    # ----------- get
+    def get(self, key, default=None):
+        kb = key.encode("utf-8")
+        with self.lock:
+            cell, slot = self._find(kb, hash(kb))
+            if slot < 0:
+                return default
+            start = self.offs[slot] + self.klens[slot]
+            return self.data[start:start + self.vlens[slot]].decode("utf-8")
+
+    # ----------- version : version given to put, None if the key is missing or has none
+    def version(self, key):
+        kb = key.encode("utf-8")
+        with self.lock:
+            cell, slot = self._find(kb, hash(kb))
+            if slot < 0 or self.versions[slot] == 0:
+                return None
+            return self.versions[slot]
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        kb = key.encode("utf-8")
+        with self.lock:
+            cell, slot = self._find(kb, hash(kb))
+            return slot >= 0
+
+    # ----------- delete
+    def pop(self, key, default=None):
+        kb = key.encode("utf-8")
+        with self.lock:
+            cell, slot = self._find(kb, hash(kb))
+            if slot < 0:
+                return default
+            start = self.offs[slot] + self.klens[slot]
+            value = self.data[start:start + self.vlens[slot]].decode("utf-8")
+
+            self._release(self.offs[slot], self.caps[slot], self.klens[slot] + self.vlens[slot])
+            self.table[cell] = DELETED
+            self.free_slots.append(slot)
+            self.count = self.count - 1
+            self._maybe_compact()
+            return value
+
+    # ----------- keys : snapshot of the keys (values are not decoded)
+    def keys(self):
+        out = []
+        with self.lock:
+            for slot in self.table:
+                if slot >= 0:
+                    off = self.offs[slot]
+                    out.append(self.data[off:off + self.klens[slot]].decode("utf-8"))
+        return out
+
+    # ----------- items : snapshot of (key, value) pairs
+    def items(self):
+        out = []
+        with self.lock:
+            for slot in self.table:
+                if slot >= 0:
+                    off = self.offs[slot]
+                    kend = off + self.klens[slot]
+                    key = self.data[off:kend].decode("utf-8")
+                    value = self.data[kend:kend + self.vlens[slot]].decode("utf-8")
+                    out.append((key, value))
+        return out
+
+    # ----------- _maybe_compact : rewrite live records back to back when too much is dead
+    # caller holds the lock
+    def _maybe_compact(self):
+        if len(self.data) < COMPACT_MIN_BYTES:
+            return
+        if self.garbage < len(self.data) * COMPACT_RATIO:
+            return
+        self._compact()
+
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        data = bytearray()
+        for slot in self.table:
+            if slot >= 0:
+                off = self.offs[slot]
+                size = self.klens[slot] + self.vlens[slot]
+                self.offs[slot] = len(data)
+                self.caps[slot] = size
+                data += self.data[off:off + size]
+        self.data = data
+        self.free_space = {}
+        self.garbage = 0
+
+    # ----------- memory_bytes : bytes held by the arena and index arrays
+    def memory_bytes(self):
+        total = len(self.data)
+        total = total + len(self.table) * self.table.itemsize
+        for arr in (self.offs, self.klens, self.vlens, self.caps, self.hashes, self.versions):
+            total = total + len(arr) * arr.itemsize
+        return total
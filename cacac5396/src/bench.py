@@ -6,11 +6,19 @@ import sys
 import time
 import json
 import random
-import string
 import http.client
 import argparse
+import threading
+import itertools
 import os #for csv file
 
+from histogram import Histogram  # latency percentiles without keeping every sample
+import workload  # YCSB style key/size distributions and op mixes
+from workload import rand_text
+
+CSV_HEADER = ("n_nodes,op,run_idx,count,duration_s,ops_per_s,mode,concurrency,offered_ops_s," +
+              "p50_ms,p90_ms,p99_ms,p999_ms,max_ms,workload,warmup_s,rate_ops_s")
+
 # -------- helpers
 
 def now_s():
@@ -19,28 +27,52 @@ def now_s():
     t = time.perf_counter()
     return t
 
-def rand_text(n):
-    # build a random string of length n
-    # control the size for PUT
-    letters = string.ascii_letters + string.digits
-    out = ""
-    i = 0
-    while i < n:
-        ch = random.choice(letters) #create the string
-        out = out + ch
-        i = i + 1
-    return out
-
-def do_put(address, key, value):
+
+# -------- connection pool
+# one pool per worker thread, one connection object per node
+# http.client reopens the socket by itself if the server closed it (HTTP/1.0 servers close after each reply)
+# so we reuse the connection when the server keeps it alive and pay a new connect only when it does not
+
+class ConnPool:
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self.conns = {}
+
+    def get(self, address):
+        conn = self.conns.get(address)
+        if conn is None:
+            conn = http.client.HTTPConnection(address, timeout=self.timeout)
+            self.conns[address] = conn
+        return conn
+
+    def drop(self, address):
+        # broken connection: close it, next get() makes a fresh one
+        conn = self.conns.pop(address, None)
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close(self):
+        for address in list(self.conns):
+            self.drop(address)
+
+
+def do_put(address, key, value, pool=None):
     # send PUT /storage/<key> with value to one entry node 
-    conn = http.client.HTTPConnection(address, timeout=5) # timeout if nothing answers in 5 seconds (clean connection exit)
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnPool() # timeout if nothing answers in 5 seconds (clean connection exit)
 
     try:
+        conn = pool.get(address)
         path = "/storage/" + key 
 
         headers = {}
         headers["Content-Type"] = "text/plain; charset=utf-8"
-        headers["Connection"] = "close"
+        if own_pool:
+            headers["Connection"] = "close"
 
         body_bytes = value.encode("utf-8") #send plain text 
 
@@ -54,22 +86,25 @@ def do_put(address, key, value):
             return False
 
     except Exception:
+        pool.drop(address)
         return False
 
     finally: #alwyas run
-        try:
-            conn.close()
-        except Exception: #ignore errors
-            pass
+        if own_pool:
+            pool.close()
 
-def do_get(address, key):
+def do_get(address, key, pool=None):
     # GET /storage/<key> from one entry node
-    conn = http.client.HTTPConnection(address, timeout=5)
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnPool()
     try:
+        conn = pool.get(address)
         path = "/storage/" + key
 
         headers = {}
-        headers["Connection"] = "close"
+        if own_pool:
+            headers["Connection"] = "close"
 
         conn.request("GET", path, headers=headers)
         resp = conn.getresponse()
@@ -82,19 +117,179 @@ def do_get(address, key):
             return False, data
 
     except Exception:
+        pool.drop(address)
         return False, b"" #empty bytes
 
     finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
-
-# -------- main
-
-def main():
-
-    # --- arguments
+        if own_pool:
+            pool.close()
+
+# -------- load phases
+
+def run_phase(ops, nodes, concurrency, rate, warmup=0.0, window=0.1):
+    # run a list of ops = (kind, key, value), kind is
+    #   PUT / GET (classic phases), READ / UPDATE / INSERT / RMW (workload mixes, RMW = GET then PUT)
+    # closed loop (rate 0): concurrency workers, each sends its next request when the last one answered
+    # open loop (rate > 0): op i is due at start + i / rate no matter how slow the server is,
+    #                       concurrency workers pick up due ops (too few workers = ops start late)
+    #                       latency is measured from the due time, not from when the request went out:
+    #                       a stalled server makes the next ops late and that wait is part of their latency
+    #                       (coordinated omission). the send -> reply time is kept as "service" histogram
+    # every op lands in a time window (window seconds, by due time in open loop, send time in closed)
+    # with its own histograms per kind, merged when the phase is over (no lock on the hot path)
+    # warmup > 0: ops in the first warmup seconds are run but not counted
+    # warmup < 0: auto, the warmup is the window cut that mser() picks (steady state detection)
+    # returns (duration in s after warmup, {kind: [ok, total, latency hist, service hist]}, excluded warmup s)
+
+    counter = itertools.count()  # next op index, shared by all workers (next() is atomic under the GIL)
+    results = []
+    start = [0.0]
+
+    def worker():
+        pool = ConnPool()
+        mine = {}  # (kind, window) -> [ok, total, latency hist, service hist]
+        while True:
+            i = next(counter)
+            if i >= len(ops):
+                break
+            if rate > 0:
+                due = start[0] + i / rate
+                wait = due - now_s()
+                if wait > 0:
+                    time.sleep(wait)
+            kind, key, value = ops[i]
+            addr = random.choice(nodes)  #pick a random node from nodes to contact
+            sent = now_s()
+            if rate <= 0:
+                due = sent  # closed loop has no schedule, latency = service time
+            if kind == "GET" or kind == "READ":
+                good, _data = do_get(addr, key, pool)
+            elif kind == "RMW":
+                good, _data = do_get(addr, key, pool)
+                if good == True:
+                    good = do_put(addr, key, value, pool)
+            else:
+                good = do_put(addr, key, value, pool)
+            done = now_s()
+
+            offset = due - start[0]
+            if warmup > 0 and offset < warmup:
+                w = -1  # fixed warmup, never counted
+            else:
+                w = int(offset / window)
+            stats = mine.get((kind, w))
+            if stats is None:
+                stats = [0, 0, Histogram(), Histogram()]
+                mine[(kind, w)] = stats
+            stats[1] = stats[1] + 1
+            if good == True:
+                stats[2].record((done - due) * 1e6)
+                stats[3].record((done - sent) * 1e6)
+                stats[0] = stats[0] + 1 #count the successs
+        pool.close()
+        results.append(mine)
+
+    threads = []
+    for _ in range(concurrency):
+        threads.append(threading.Thread(target=worker, daemon=True))
+
+    start[0] = now_s() #start timer
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = now_s() - start[0] #stop timer
+
+    # merge the workers, per window
+    windows = {}
+    for mine in results:
+        for kind, w in mine:
+            if (kind, w) not in windows:
+                windows[(kind, w)] = [0, 0, Histogram(), Histogram()]
+            into = windows[(kind, w)]
+            part = mine[(kind, w)]
+            into[0] = into[0] + part[0]
+            into[1] = into[1] + part[1]
+            into[2].merge(part[2])
+            into[3].merge(part[3])
+
+    # where the measured part starts
+    excluded = 0.0
+    first_window = 0
+    if warmup > 0:
+        excluded = min(warmup, duration)
+    elif warmup < 0:
+        first_window = steady_start(windows)
+        excluded = min(first_window * window, duration)
+
+    merged = {}
+    for kind, w in windows:
+        if w < first_window:
+            continue
+        if kind not in merged:
+            merged[kind] = [0, 0, Histogram(), Histogram()]
+        merged[kind][0] = merged[kind][0] + windows[(kind, w)][0]
+        merged[kind][1] = merged[kind][1] + windows[(kind, w)][1]
+        merged[kind][2].merge(windows[(kind, w)][2])
+        merged[kind][3].merge(windows[(kind, w)][3])
+
+    return duration - excluded, merged, excluded
+
+# ----------- mser : steady state start in a series of window means (MSER, White 1997)
+# for every cut d in the first half, score = variance of what is left / (n - d)
+# (the standard error of the mean of the kept part); the cut with the lowest score drops the
+# warmup transient but not more than needed (dropping data makes the error grow again)
+def mser(values):
+    n = len(values)
+    best_d = 0
+    best_score = None
+    for d in range(0, n // 2 + 1):
+        rest = values[d:]
+        if len(rest) < 2:
+            break
+        m = sum(rest) / len(rest)
+        sq = 0.0
+        for x in rest:
+            sq = sq + (x - m) * (x - m)
+        score = sq / (len(rest) * len(rest))
+        if best_score is None or score < best_score:
+            best_score = score
+            best_d = d
+    return best_d
+
+# ----------- steady_start : first window of the steady state, from the mean latency of every window
+def steady_start(windows):
+    totals = {}  # window -> [latency sum, samples]
+    for kind, w in windows:
+        if w < 0:
+            continue
+        hist = windows[(kind, w)][2]
+        if w not in totals:
+            totals[w] = [0, 0]
+        totals[w][0] = totals[w][0] + hist.total
+        totals[w][1] = totals[w][1] + hist.count
+
+    order = []
+    means = []
+    for w in sorted(totals):
+        if totals[w][1] > 0:
+            order.append(w)
+            means.append(totals[w][0] / totals[w][1])
+    if len(means) < 4:
+        return 0  # too short to tell
+    d = mser(means)
+    if d >= len(means) // 2:
+        # the best cut is as late as allowed: latency still drifting, no steady state in this phase
+        print("[warn] no steady state found in the first half of the phase (more --ops or a lower --rate)")
+    return order[d]
+
+def ms(us):
+    # microseconds -> "x.xxx" milliseconds for csv and prints
+    return format(us / 1000.0, ".3f")
+
+# -------- setup shared by bench.py and loadgen.py
+
+def make_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("nodes", nargs="*", help="entry nodes like MSI:55001 MSI:55002 ... (optional if --peers is used)")
     ap.add_argument("--peers", default="", help="path to a JSON file with a list of nodes (e.g., peers.json)")
@@ -102,8 +297,79 @@ def main():
     ap.add_argument("--repeats", type=int, default=5, help="number of runs to repeat (default 5)")
     ap.add_argument("--value-size", type=int, default=100, help="bytes per value (default 100)")
     ap.add_argument("--csv", default="results.csv", help="output CSV file")
-    args = ap.parse_args()
+    ap.add_argument("--concurrency", type=int, default=1,
+                    help="parallel workers (closed loop: requests in flight, default 1 = one at a time)")
+    ap.add_argument("--rate", type=float, default=0.0,
+                    help="open loop: target ops/s for each phase, spread over the workers (default 0 = closed loop)")
+    ap.add_argument("--warmup", default="0",
+                    help="seconds at the start of every phase that are run but not counted, or auto (steady state detection)")
+    ap.add_argument("--window", type=float, default=0.1,
+                    help="time window in seconds for --warmup auto (default 0.1)")
+    ap.add_argument("--hist-json", default="",
+                    help="also save the latency histograms (per op and run, mergeable) to this JSON file")
+    # workload options (without --workload: classic PUT phase then GET phase on sequential keys)
+    ap.add_argument("--workload", default="", choices=[""] + sorted(workload.PRESETS) + ["custom"],
+                    help="YCSB style preset A,B,C,D,F or custom (load --records keys, then --ops mixed ops)")
+    ap.add_argument("--records", type=int, default=1000, help="workload: records loaded before the mixed phase (default 1000)")
+    ap.add_argument("--read-proportion", type=float, default=0.5, help="custom workload: share of reads")
+    ap.add_argument("--update-proportion", type=float, default=0.5, help="custom workload: share of updates")
+    ap.add_argument("--insert-proportion", type=float, default=0.0, help="custom workload: share of inserts")
+    ap.add_argument("--rmw-proportion", type=float, default=0.0, help="custom workload: share of read-modify-writes")
+    ap.add_argument("--key-dist", default="", choices=[""] + list(workload.KEY_DISTS),
+                    help="key popularity (default: the preset's, zipfian for custom)")
+    ap.add_argument("--value-dist", default="constant", choices=list(workload.VALUE_DISTS),
+                    help="value sizes: constant = --value-size, uniform/zipfian = 1..--value-size")
+    ap.add_argument("--seed", type=int, default=None, help="random seed for reproducible workloads")
+    return ap
+
+
+# ----------- check_args : validate, exit with a message on bad input
+# returns (warmup seconds for run_phase, mode, workload spec or None, workload name)
+def check_args(args):
+    if args.concurrency < 1 or args.rate < 0:
+        print("[error] --concurrency must be 1 or more and --rate 0 or more")
+        sys.exit(1)
+
+    # --warmup auto is passed to run_phase as -1
+    if args.warmup == "auto":
+        warmup = -1.0
+    else:
+        try:
+            warmup = float(args.warmup)
+        except ValueError:
+            warmup = -2.0
+        if warmup < 0:
+            print("[error] --warmup must be seconds (0 or more) or auto")
+            sys.exit(1)
+    if args.window <= 0:
+        print("[error] --window must be more than 0")
+        sys.exit(1)
+
+    # closed loop measures capacity at a fixed number of clients,
+    # open loop offers a fixed load (rate_ops_s in csv) so the saturation point shows as achieved < offered
+    if args.rate > 0:
+        mode = "open"
+    else:
+        mode = "closed"
+
+    # --- workload spec
+    spec = None
+    if args.workload == "custom":
+        spec = {"read": args.read_proportion, "update": args.update_proportion,
+                "insert": args.insert_proportion, "rmw": args.rmw_proportion, "dist": "zipfian"}
+    elif args.workload != "":
+        spec = dict(workload.PRESETS[args.workload])
+    if spec is not None and args.key_dist != "":
+        spec["dist"] = args.key_dist
+    if spec is not None and args.records < 1:
+        print("[error] --records must be 1 or more")
+        sys.exit(1)
+    workload_name = args.workload if args.workload != "" else "putget"
+    return warmup, mode, spec, workload_name
 
+
+# ----------- load_nodes : entry nodes from --peers or the command line
+def load_nodes(args):
     # --- build nodes list: --peers file is better
     nodes = []
     if args.peers != "":
@@ -128,108 +394,173 @@ def main():
     if len(nodes) == 0:
         print("[error] no nodes provided (use --peers peers.json or list nodes on the command line)")
         sys.exit(1)
+    return nodes
 
 
-    n_nodes = len(nodes) #  how many nodes are there
-
-    print("[info] nodes: " + str(nodes)) #safety check
-    print("[info] ops per run: " + str(args.ops) + ", repeats: " + str(args.repeats) + ", value_size: " + str(args.value_size))
-
-    if os.path.exists(args.csv) == False: #update or create a csv file with header
+# ----------- open_csv : create the csv with its header, or check an existing one has the same columns
+def open_csv(path):
+    if os.path.exists(path) == False: #update or create a csv file with header
         try:
-            f = open(args.csv, "w", encoding="utf-8")
-            f.write("n_nodes,op,run_idx,count,duration_s,ops_per_s\n")
+            f = open(path, "w", encoding="utf-8")
+            f.write(CSV_HEADER + "\n")
             f.close()
         except Exception:
-            print("[error] cannot open csv file for write: " + args.csv)
+            print("[error] cannot open csv file for write: " + path)
+            sys.exit(1)
+    else:
+        # do not mix rows with an older column layout
+        f = open(path, "r", encoding="utf-8")
+        header = f.readline().strip()
+        f.close()
+        if header != CSV_HEADER:
+            print("[error] " + path + " has other columns (older bench.py?), use a new --csv file")
             sys.exit(1)
 
-    run_idx = 0 #loop for each run
-    while run_idx < args.repeats: #   counts which run
 
+# ----------- build_phases : the op lists of one run (all built before any timer starts)
+# run_tag goes in the key names (run index, loadgen.py adds the process so key spaces do not overlap)
+def build_phases(args, spec, run_tag, op_count, record_count, rng):
+    if spec is None:
         # ----- build keys and one value for this run
-
         keys = []
         i = 0
-        while i < args.ops:
+        while i < op_count:
             # build a list of keys for this run 
-            key = "k" + str(run_idx) + "_" + str(i)
+            key = "k" + str(run_tag) + "_" + str(i)
             keys.append(key)
             i = i + 1
         # all use the same random value string of length value_size
-        value = rand_text(args.value_size)
+        value = rand_text(args.value_size, rng)
         #random strings here because for benchmarking we only care about size
         # and speed, not the actual content
 
+        phases = []
+        phases.append([("PUT", k, value) for k in keys])
+        phases.append([("GET", k, None) for k in keys])
+    else:
+        # ----- load records, then the mixed ops
+        sizes = workload.SizeChooser(args.value_dist, args.value_size)
+        pool = workload.ValuePool(args.value_size, rng)
+        load = workload.build_load(run_tag, record_count, sizes, pool, rng)
+        phases = []
+        phases.append([("LOAD", k, v) for _, k, v in load])
+        phases.append(workload.build_run(spec, run_tag, record_count, op_count, sizes, pool, rng))
+    return phases
+
+
+# ----------- Report : prints + csv rows per phase, merged histograms of all runs at the end
+class Report:
+    def __init__(self, args, n_nodes, mode, workload_name):
+        self.args = args
+        self.n_nodes = n_nodes
+        self.mode = mode
+        self.workload_name = workload_name
+        self.totals = {}   # histograms of all runs together (per op kind)
+        self.saved = []    # every histogram, for --hist-json
+
+    def phase(self, run_idx, dt, stats, excluded):
+        # print + csv row for every op kind of one phase
+        args = self.args
+        if len(stats) == 0:
+            print("[warn] run " + str(run_idx) + ": the whole phase was warmup, nothing counted (lower --warmup)")
+        counted = 0  # ops after warmup, all kinds (offered rate of a kind = its share of rate)
+        for op in stats:
+            counted = counted + stats[op][1]
+        for op in stats:
+            ok_count, total, hist, service = stats[op]
+            if op not in self.totals:
+                self.totals[op] = Histogram()
+            self.totals[op].merge(hist)
+            self.saved.append({"op": op, "run_idx": run_idx, "hist": hist.to_dict()})
+            lat = hist.summary()
+
+            if dt > 0:
+                ops_per_s = ok_count / dt #calc per second (achieved throughput)
+            else:
+                ops_per_s = 0.0
+
+            offered = ""
+            if args.rate > 0:
+                offered = " (offered " + format(args.rate * total / counted, ".1f") + " ops/s)"
+            if excluded > 0:
+                offered = offered + " after " + format(excluded, ".2f") + "s warmup"
+            print("[run " + str(run_idx) + "] " + op + ": " + str(ok_count) + "/" + str(total) +
+                  " in " + format(dt, ".3f") + "s = " + format(ops_per_s, ".1f") + " ops/s" + offered)
+            print("        latency ms p50 " + ms(lat["p50"]) + " p90 " + ms(lat["p90"]) + " p99 " + ms(lat["p99"]) +
+                  " p99.9 " + ms(lat["p99.9"]) + " max " + ms(lat["max"]))
+            if args.rate > 0:
+                # what the latency would look like without counting the time ops waited for their turn
+                srv = service.summary()
+                print("        service ms p50 " + ms(srv["p50"]) + " p99 " + ms(srv["p99"]) +
+                      " max " + ms(srv["max"]) + " (send -> reply, hides queueing)")
+
+            try: #append in csv
+                f = open(args.csv, "a", encoding="utf-8")
+                line = (str(self.n_nodes) + "," + op + "," + str(run_idx) + "," + str(ok_count) + "," +
+                        format(dt, ".6f") + "," + format(ops_per_s, ".3f") + "," +
+                        self.mode + "," + str(args.concurrency) + "," + format(args.rate * total / counted, ".3f") + "," +
+                        ms(lat["p50"]) + "," + ms(lat["p90"]) + "," + ms(lat["p99"]) + "," +
+                        ms(lat["p99.9"]) + "," + ms(lat["max"]) + "," + self.workload_name + "," +
+                        format(excluded, ".3f") + "," + format(args.rate, ".3f") + "\n")
+                f.write(line)
+                f.close()
+            except Exception:
+                print("[error] cannot append csv (" + op + ")")
+
+    def finish(self):
+        args = self.args
+        # all repeats merged (percentiles of the whole set, not an average of percentiles)
+        for op in self.totals:
+            lat = self.totals[op].summary()
+            print("[all runs] " + op + " latency ms p50 " + ms(lat["p50"]) + " p90 " + ms(lat["p90"]) +
+                  " p99 " + ms(lat["p99"]) + " p99.9 " + ms(lat["p99.9"]) + " max " + ms(lat["max"]) +
+                  " (" + str(lat["count"]) + " samples)")
+
+        if args.hist_json != "":
+            try:
+                f = open(args.hist_json, "w", encoding="utf-8")
+                json.dump({"n_nodes": self.n_nodes, "unit": "us", "workload": self.workload_name, "runs": self.saved}, f)
+                f.close()
+            except Exception:
+                print("[error] cannot write histogram file: " + args.hist_json)
+
+        print("[done] wrote " + args.csv)
+
+
+def print_info(args, nodes, mode, spec):
+    print("[info] nodes: " + str(nodes)) #safety check
+    print("[info] ops per run: " + str(args.ops) + ", repeats: " + str(args.repeats) + ", value_size: " + str(args.value_size))
+    print("[info] mode: " + mode + ", concurrency: " + str(args.concurrency) + ", rate: " + str(args.rate) +
+          ", warmup: " + args.warmup)
+    if spec is not None:
+        print("[info] workload " + args.workload + ": " + json.dumps(spec) + ", records: " + str(args.records) +
+              ", value sizes: " + args.value_dist)
 
-        # ----- PUT phase
-        t0 = now_s() #start timer
-        ok_put = 0
-
-        i = 0
-        while i < len(keys): #loop over the keys
-            k = keys[i]
-            addr = random.choice(nodes)  #pick a random node from nodes to contact
-            ok = do_put(addr, k, value)
-            if ok == True:
-                ok_put = ok_put + 1 #count the successs
-            i = i + 1
-
-        t1 = now_s() #stop timer
-        dt_put = t1 - t0 #timing saved
-
-        if dt_put > 0:
-            ops_per_s_put = ok_put / dt_put #calc per second
-        else:
-            ops_per_s_put = 0.0
-
-        print("[run " + str(run_idx) + "] PUT: " + str(ok_put) + "/" + str(args.ops) +
-              " in " + format(dt_put, ".3f") + "s = " + format(ops_per_s_put, ".1f") + " ops/s")
-
-        try: #append in csv
-            f = open(args.csv, "a", encoding="utf-8")
-            line = str(n_nodes) + ",PUT," + str(run_idx) + "," + str(ok_put) + "," + format(dt_put, ".6f") + "," + format(ops_per_s_put, ".3f") + "\n"
-            f.write(line)
-            f.close()
-        except Exception:
-            print("[error] cannot append csv (PUT)")
-
-        # ----- GET phase
-        #same as PUT but each key
-        t0 = now_s()
-        ok_get = 0
-
-        i = 0
-        while i < len(keys):
-            k = keys[i]
-            addr = random.choice(nodes)
-            ok, data = do_get(addr, k)
-            if ok == True:
-                ok_get = ok_get + 1
-            i = i + 1
+# -------- main
 
-        t1 = now_s()
-        dt_get = t1 - t0
+def main():
+    args = make_parser().parse_args()
+    warmup, mode, spec, workload_name = check_args(args)
+    rng = random.Random(args.seed)
+    nodes = load_nodes(args)
+    n_nodes = len(nodes) #  how many nodes are there
 
-        if dt_get > 0:
-            ops_per_s_get = ok_get / dt_get
-        else:
-            ops_per_s_get = 0.0
+    print_info(args, nodes, mode, spec)
+    open_csv(args.csv)
+    report = Report(args, n_nodes, mode, workload_name)
 
-        print("[run " + str(run_idx) + "] GET: " + str(ok_get) + "/" + str(args.ops) +
-              " in " + format(dt_get, ".3f") + "s = " + format(ops_per_s_get, ".1f") + " ops/s")
+    run_idx = 0 #loop for each run
+    while run_idx < args.repeats: #   counts which run
+        phases = build_phases(args, spec, run_idx, args.ops, args.records, rng)
 
-        try:
-            f = open(args.csv, "a", encoding="utf-8")
-            line = str(n_nodes) + ",GET," + str(run_idx) + "," + str(ok_get) + "," + format(dt_get, ".6f") + "," + format(ops_per_s_get, ".3f") + "\n"
-            f.write(line)
-            f.close()
-        except Exception:
-            print("[error] cannot append csv (GET)")
+        # ----- run the phases in order (PUT then GET, or LOAD then mix)
+        for phase_ops in phases:
+            dt, stats, excluded = run_phase(phase_ops, nodes, args.concurrency, args.rate, warmup, args.window)
+            report.phase(run_idx, dt, stats, excluded)
 
         run_idx = run_idx + 1
 
-    print("[done] wrote " + args.csv)
+    report.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# ------ cache.py
+# small read cache for hot keys on nodes that do not own them
+# entries = (value, version from the owner, time cached), dropped after ttl seconds
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class ReadCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (value, version, cached_at), oldest use first
+        self.lock = threading.Lock()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+        self.age_sum = 0.0   # sum of entry ages on hits (how stale were the answers)
+        self.age_max = 0.0
+
+    def enabled(self):
+        return self.max_entries > 0
+
+    # ----------- get : (value, version) or None if missing/expired
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses = self.misses + 1
+                return None
+
+            age = now - entry[2]
+            if age > self.ttl:
+                del self.entries[key]
+                self.expired = self.expired + 1
+                self.misses = self.misses + 1
+                return None
+
+            self.entries.move_to_end(key)  # recently used
+            self.hits = self.hits + 1
+            self.age_sum = self.age_sum + age
+            if age > self.age_max:
+                self.age_max = age
+            return entry[0], entry[1]
+
+    # ----------- put : remember a value seen on the way back from the owner
+    # never replace a newer version with an older one (replies can arrive out of order)
+    def put(self, key, value, version):
+        with self.lock:
+            old = self.entries.get(key)
+            if old is not None and old[1] > version:
+                return
+            self.entries[key] = (value, version, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)  # least recently used out
+                self.evicted = self.evicted + 1
+
+    # ----------- invalidate : owner says key changed (drop anything older than version)
+    def invalidate(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] < version:
+                del self.entries[key]
+                self.invalidated = self.invalidated + 1
+
+    # ----------- drop : forget key whatever its version (a PUT for it passes through this node)
+    def drop(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.invalidated = self.invalidated + 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            out = {}
+            out["entries"] = len(self.entries)
+            out["max_entries"] = self.max_entries
+            out["ttl_s"] = self.ttl
+            out["hits"] = self.hits
+            out["misses"] = self.misses
+            out["hit_rate"] = (self.hits / lookups) if lookups > 0 else 0.0
+            out["expired"] = self.expired
+            out["evicted"] = self.evicted
+            out["invalidated"] = self.invalidated
+            out["avg_hit_age_s"] = (self.age_sum / self.hits) if self.hits > 0 else 0.0
+            out["max_hit_age_s"] = self.age_max
+            return out
@@ -2,6 +2,7 @@
 # ------ chord.py
 
 import hashlib
+import bisect
 
 # 160 bits because SHA1 hashing produce IDs as binary numbers (hence 2^160 possibilities)
 # example 3 bits = 2^3 = 8 IDs
@@ -69,9 +70,74 @@ def how_many_fingers(node_count):
         count = M_BITS
     return count
 
+# ----------- host_of : physical host part of an address ("c1-2:55001" -> "c1-2")
+def host_of(address):
+    return address.rsplit(":", 1)[0]
+
+# ----------- pick_replicas : choose the next successors that keep extra copies
+# walk the sorted ring clockwise from my_index and take up to count nodes
+# first pass prefers nodes on other physical hosts (a dead compute node should not take all copies)
+# second pass fills with the remaining successors if there are not enough hosts
+def pick_replicas(ring, my_index, count):
+
+    chosen = []
+    if count <= 0 or len(ring) <= 1:
+        return chosen
+
+    my_host = host_of(ring[my_index][0])
+    used_hosts = set()
+    used_hosts.add(my_host)
+
+    # first pass: one replica per different host
+    for step in range(1, len(ring)):
+        if len(chosen) >= count:
+            break
+        pair = ring[(my_index + step) % len(ring)]
+        h = host_of(pair[0])
+        if h not in used_hosts:
+            chosen.append(pair)
+            used_hosts.add(h)
+
+    # second pass: fill with the closest successors not taken yet
+    for step in range(1, len(ring)):
+        if len(chosen) >= count:
+            break
+        pair = ring[(my_index + step) % len(ring)]
+        if pair not in chosen:
+            chosen.append(pair)
+
+    return chosen
+
+
+# ----------- replica_sources : the ranges my_index keeps copies of, as [(owner address, start_id, end_id)]
+# = every other node whose pick_replicas chose me, with its range (pred id, its id]
+def replica_sources(ring, my_index, count):
+    out = []
+    if count <= 0 or len(ring) <= 1:
+        return out
+    me = ring[my_index]
+    for j in range(len(ring)):
+        if j == my_index:
+            continue
+        if me in pick_replicas(ring, j, count):
+            out.append((ring[j][0], ring[(j - 1) % len(ring)][1], ring[j][1]))
+    return out
+
+
+# ----------- sorted_ring : [(address, id)] sorted by id, plus the list of ids alone (for bisect)
+def sorted_ring(addresses):
+    ring = []
+    for addr in set(addresses):
+        ring.append((addr, hash_to_id(addr)))
+    ring.sort(key=lambda pair: pair[1])
+    ids = []
+    for pair in ring:
+        ids.append(pair[1])
+    return ring, ids
+
 
 class ChordNode:
-    def __init__(self, self_address, peer_addresses):
+    def __init__(self, self_address, peer_addresses, replica_count=0):
 
         # remember own address
         self.self_address = self_address
@@ -163,8 +229,49 @@ class ChordNode:
 
             self.fingers.append(chosen) #add it to the finger table list
 
+        #--- replica targets (successors that keep a copy of my keys)
+        self.replicas = pick_replicas(ring, my_index, replica_count)
+
+        # replicas of my successor: when it owns a key i am the last hop, and a GET can go to any of them
+        self.succ_replicas = pick_replicas(ring, (my_index + 1) % len(ring), replica_count)
+
+        # the other way round: nodes that keep copies here (a restart pulls them back from the owners)
+        self.replica_of = replica_sources(ring, my_index, replica_count)
+
         # after init, the local variable "ring" disappears (not saved to self)
-        # so this node only keeps pred, succ, and fingers to self 
+        # so this node only keeps pred, succ, fingers and replicas to self 
+
+    # ----------- from_ring : same node as __init__ but from an already sorted ring (simulate.py)
+    # no hashing and no linear scans: finger targets are found with bisect on ids, so building
+    # every node of a 1M ring is possible. exponents = which 2^i fingers (default as __init__)
+    @classmethod
+    def from_ring(cls, ring, ids, my_index, exponents=None, replica_count=0):
+        node = cls.__new__(cls)
+        node.self_address = ring[my_index][0]
+        node.self_id = ring[my_index][1]
+
+        pred = ring[(my_index - 1) % len(ring)]
+        succ = ring[(my_index + 1) % len(ring)]
+        node.pred_address = pred[0]
+        node.pred_id = pred[1]
+        node.succ_address = succ[0]
+        node.succ_id = succ[1]
+
+        if exponents is None:
+            exponents = range(how_many_fingers(len(ring)))
+
+        node.fingers = []
+        for i in exponents:
+            start = (node.self_id + 2 ** i) % RING_SIZE
+            j = bisect.bisect_left(ids, start)  # first node with id >= start
+            if j == len(ring):
+                j = 0                            # wrap around to first in ring
+            node.fingers.append(ring[j])
+
+        node.replicas = pick_replicas(ring, my_index, replica_count)
+        node.succ_replicas = pick_replicas(ring, (my_index + 1) % len(ring), replica_count)
+        node.replica_of = replica_sources(ring, my_index, replica_count)
+        return node
 
     # ---------------------------------------
 
@@ -175,7 +282,9 @@ class ChordNode:
         return result
 
     # ----------- shortcut_step : choose the closest immediate "neighbor" node to the target (sometimes target itself)
-    def shortcut_step(self, target_id):
+    # usable (optional) = function(address) -> False for fingers to avoid (ex: a peer that keeps failing)
+    # skipping a finger still makes progress (a closer finger is taken), it only costs hops
+    def shortcut_step(self, target_id, usable=None):
 
         # go through fingers from last to first
         index = len(self.fingers) - 1
@@ -187,7 +296,7 @@ class ChordNode:
             if node_address != self.self_address: #check that is not himself 
                 # PATCH (could cause infinite loop if himself in table, could happen in small rings)
                 in_range = finger_in_open_interval(node_id, self.self_id, target_id)
-                if in_range == True:
+                if in_range == True and (usable is None or usable(node_address)):
                     return node_address
 
             index = index - 1
@@ -195,6 +304,27 @@ class ChordNode:
         # if no finger fits, use direct successor (fallback to the slow way)
         return self.succ_address
 
+    # ----------- read_targets : owner + its replicas if my successor owns key_id (I am the last hop),
+    # else None (keep routing). routing never passes the owner, so replicas (its successors) are
+    # only reached if the last hop sends reads to them
+    def read_targets(self, key_id):
+        if len(self.succ_replicas) == 0:
+            return None
+        if not in_interval_open_closed(key_id, self.self_id, self.succ_id):
+            return None
+        out = [self.succ_address]
+        for pair in self.succ_replicas:
+            if pair[0] != self.self_address:
+                out.append(pair[0])
+        return out
+
+    # ----------- replica_addresses : addresses that receive a copy of the keys this node owns
+    def replica_addresses(self):
+        out = []
+        for pair in self.replicas:
+            out.append(pair[0])
+        return out
+
     # ----------- network_view : return addresses of known neighbors (pred, succ, fingers) 
     def network_view(self):
         
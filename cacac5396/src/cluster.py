@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# cluster.py
+# run.sh for one machine: start N server.py on localhost ports, write peers.json,
+# wait until all answer /helloworld, run chord-tester.py and/or bench.py, then stop everything
+# (no ssh, no /share/ifi scripts: works on a laptop or in CI)
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_PY = os.path.join(SCRIPT_DIR, "server.py")
+BENCH_PY = os.path.join(SCRIPT_DIR, "bench.py")
+CHORD_TESTER = os.path.join(SCRIPT_DIR, "chord-tester.py")
+
+PORT_MIN = 49152
+PORT_MAX = 65535
+
+
+# ----------- free_ports : n ports in the server's allowed range that nobody listens on now
+def free_ports(n, base):
+    ports = []
+    port = base
+    while len(ports) < n and port <= PORT_MAX:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # same as server.py (allow_reuse_address)
+        try:
+            s.bind(("", port))
+            ports.append(port)
+        except OSError:
+            pass
+        finally:
+            s.close()
+        port = port + 1
+    if len(ports) < n:
+        raise RuntimeError("not enough free ports from " + str(base))
+    return ports
+
+
+# ----------- hello : True if the node answers /helloworld
+def hello(address, timeout=0.5):
+    conn = http.client.HTTPConnection(address, timeout=timeout)
+    try:
+        conn.request("GET", "/helloworld")
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status == 200
+    except Exception:
+        return False
+    finally:
+        conn.close()
+
+
+# ----------- wait_ready : probe all nodes in parallel until every one answers (or deadline)
+def wait_ready(addresses, procs, deadline_s):
+    ready = set()
+    lock = threading.Lock()
+    end = time.monotonic() + deadline_s
+
+    def probe(i, address):
+        while time.monotonic() < end:
+            if procs[i].poll() is not None:
+                return  # process died, no point waiting
+            if hello(address):
+                with lock:
+                    ready.add(address)
+                return
+            time.sleep(0.05)
+
+    threads = []
+    for i in range(len(addresses)):
+        t = threading.Thread(target=probe, args=(i, addresses[i]), daemon=True)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+    missing = []
+    for address in addresses:
+        if address not in ready:
+            missing.append(address)
+    return missing
+
+
+# ----------- start_nodes : one server.py process per address
+# pin = list of cpu ids, node i runs only on pin[i % len(pin)] (less scheduler noise between nodes)
+def start_nodes(addresses, peers_json, server_args, log_dir, pin):
+    procs = []
+    for i in range(len(addresses)):
+        port = addresses[i].rsplit(":", 1)[1]
+        log = open(os.path.join(log_dir, "node_" + port + ".log"), "w")
+
+        cmd = [sys.executable, "-u", SERVER_PY, port, peers_json] + server_args
+        p = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, cwd=SCRIPT_DIR)
+        log.close()  # child has its own copy
+        procs.append(p)
+
+        # pin right after start (before the server made its threads, they inherit the mask)
+        if pin:
+            cpu = pin[i % len(pin)]
+            try:
+                os.sched_setaffinity(p.pid, {cpu})
+            except OSError as e:
+                print("[warn] cannot pin " + addresses[i] + " to cpu " + str(cpu) + ": " + str(e))
+    return procs
+
+
+# ----------- stop_nodes : TERM, then KILL whatever is still alive after grace seconds
+def stop_nodes(procs, grace=3.0):
+    for p in procs:
+        if p.poll() is None:
+            try:
+                p.send_signal(signal.SIGTERM)
+            except Exception:
+                pass
+    end = time.monotonic() + grace
+    for p in procs:
+        left = end - time.monotonic()
+        try:
+            p.wait(timeout=max(0.0, left))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="local Chord cluster on this machine")
+    ap.add_argument("n", type=int, help="number of server.py processes")
+    ap.add_argument("--test", action="store_true", help="run chord-tester.py")
+    ap.add_argument("--bench", action="store_true", help="run bench.py (extra args after -- go to bench.py)")
+    ap.add_argument("--keep", action="store_true", help="keep nodes running until ctrl+c (no tests)")
+    ap.add_argument("--base-port", type=int, default=55000, help="first port to try (default 55000)")
+    ap.add_argument("--server-args", default="", help="extra args for every server.py, ex: --server-args=\"--replicas 1\"")
+    ap.add_argument("--pin", default="", help="pin node i to cpu list[i %% len], ex: 0-3 or 0,2,4 (linux only)")
+    ap.add_argument("--peers-out", default="", help="where to write peers.json (default: in the log dir)")
+    ap.add_argument("--csv", default=os.path.join(SCRIPT_DIR, "results.csv"), help="bench.py csv output")
+    ap.add_argument("--ready-timeout", type=float, default=10.0, help="seconds to wait for all nodes")
+
+    # everything after "--" goes to bench.py untouched
+    argv = sys.argv[1:]
+    bench_args = []
+    if "--" in argv:
+        cut = argv.index("--")
+        bench_args = argv[cut + 1:]
+        argv = argv[:cut]
+    args = ap.parse_args(argv)
+
+    if args.n < 1:
+        print("[error] need at least 1 node")
+        sys.exit(1)
+    if not (PORT_MIN <= args.base_port <= PORT_MAX):
+        print("[error] --base-port must be in " + str(PORT_MIN) + "-" + str(PORT_MAX))
+        sys.exit(1)
+
+    pin = []
+    if args.pin != "":
+        for part in args.pin.split(","):
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+                pin.extend(range(int(lo), int(hi) + 1))
+            else:
+                pin.append(int(part))
+        # only cpus we are allowed to use
+        allowed = os.sched_getaffinity(0)
+        pin = [c for c in pin if c in allowed]
+        if len(pin) == 0:
+            print("[error] none of the --pin cpus are available, allowed: " + str(sorted(allowed)))
+            sys.exit(1)
+
+    # servers call themselves <short hostname>:<port>, peers must use the same names
+    host = socket.gethostname().split(".")[0]
+    ports = free_ports(args.n, args.base_port)
+    addresses = []
+    for port in ports:
+        addresses.append(host + ":" + str(port))
+    peers_json = json.dumps(addresses)
+
+    log_dir = tempfile.mkdtemp(prefix="chord_cluster_")
+    if args.peers_out == "":
+        args.peers_out = os.path.join(log_dir, "peers.json")  # not next to the sources, it is only for this run
+    f = open(args.peers_out, "w", encoding="utf-8")
+    f.write(peers_json + "\n")
+    f.close()
+
+    print("[info] starting " + str(args.n) + " nodes, logs and peers.json in " + log_dir)
+    procs = []
+    status = 0
+    try:
+        procs = start_nodes(addresses, peers_json, args.server_args.split(), log_dir, pin)
+        t0 = time.monotonic()
+        missing = wait_ready(addresses, procs, args.ready_timeout)
+        if len(missing) > 0:
+            print("[ERROR] nodes not ready: " + ", ".join(missing) + " (see logs in " + log_dir + ")")
+            status = 1
+            return
+        print("[info] " + str(args.n) + " nodes ready in " + format(time.monotonic() - t0, ".2f") + "s")
+        print(peers_json)
+
+        if args.keep:
+            print("[info] running, ctrl+c to stop")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+
+        if args.test:
+            print("[info] chord-tester on " + addresses[0] + " ...")
+            r = subprocess.run([sys.executable, CHORD_TESTER, addresses[0]], cwd=SCRIPT_DIR)
+            if r.returncode != 0:
+                status = r.returncode
+
+        if args.bench:
+            print("[info] bench.py ...")
+            cmd = [sys.executable, BENCH_PY, "--peers", args.peers_out, "--csv", args.csv] + bench_args
+            r = subprocess.run(cmd, cwd=SCRIPT_DIR)
+            if r.returncode != 0:
+                status = r.returncode
+    finally:
+        print("[info] stopping nodes ...")
+        stop_nodes(procs)
+        sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
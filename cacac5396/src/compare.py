@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# compare.py
+# compare two bench.py result files (baseline vs new) and fail on a real slowdown
+# rows are grouped per configuration (n_nodes, op, mode, concurrency, --rate, workload),
+# the repeats of a configuration are the samples
+# a regression = worse by more than --threshold percent AND the confidence interval of the
+# difference does not include 0 (Welch t interval), so noise between runs does not fail the gate
+#
+# exit code: 0 ok, 1 regression found, 2 bad input
+
+import sys
+import csv
+import math
+import argparse
+
+# two sided t critical values, df 1..30 then 40, 60, 120, infinity
+T_DF = list(range(1, 31)) + [40, 60, 120, float("inf")]
+T_TABLE = {
+    0.90: [6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+           1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+           1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697,
+           1.684, 1.671, 1.658, 1.645],
+    0.95: [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+           2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+           2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+           2.021, 2.000, 1.980, 1.960],
+    0.99: [63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+           3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+           2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750,
+           2.704, 2.660, 2.617, 2.576],
+}
+
+# configuration columns (missing in old files = "")
+# rate_ops_s is the configured --rate; offered_ops_s is measured per run (differs a bit every run)
+# and would put every open loop run in its own group
+CONFIG_COLS = ["n_nodes", "op", "mode", "concurrency", "rate_ops_s", "workload"]
+
+# metric column -> True if higher is better
+METRICS = {
+    "ops_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+}
+
+
+# ----------- t_critical : t value for a confidence level and (fractional) degrees of freedom
+# between table rows we take the next smaller df (slightly wider interval = safer)
+def t_critical(confidence, df):
+    values = T_TABLE[confidence]
+    best = values[0]
+    for i in range(len(T_DF)):
+        if T_DF[i] <= df:
+            best = values[i]
+    return best
+
+
+def mean_std(xs):
+    m = sum(xs) / len(xs)
+    if len(xs) < 2:
+        return m, 0.0
+    var = 0.0
+    for x in xs:
+        var = var + (x - m) * (x - m)
+    var = var / (len(xs) - 1)
+    return m, math.sqrt(var)
+
+
+# ----------- welch_interval : confidence interval of mean(b) - mean(a), None if not enough samples
+def welch_interval(a, b, confidence):
+    if len(a) < 2 or len(b) < 2:
+        return None
+    ma, sa = mean_std(a)
+    mb, sb = mean_std(b)
+    va = sa * sa / len(a)
+    vb = sb * sb / len(b)
+    diff = mb - ma
+    if va + vb == 0:
+        return diff, diff  # no spread at all: the difference is exact
+    df = (va + vb) ** 2 / ((va * va) / (len(a) - 1) + (vb * vb) / (len(b) - 1))
+    half = t_critical(confidence, df) * math.sqrt(va + vb)
+    return diff - half, diff + half
+
+
+# ----------- load : {config tuple: {metric: [values per repeat]}}
+def load(path):
+    groups = {}
+    f = open(path, "r", encoding="utf-8")
+    try:
+        for row in csv.DictReader(f):
+            config = []
+            for col in CONFIG_COLS:
+                config.append(row.get(col, "") or "")
+            config = tuple(config)
+            if config not in groups:
+                groups[config] = {}
+            for metric in METRICS:
+                text = row.get(metric)
+                if text is None or text == "":
+                    continue
+                if metric not in groups[config]:
+                    groups[config][metric] = []
+                groups[config][metric].append(float(text))
+    finally:
+        f.close()
+    return groups
+
+
+def config_name(config):
+    parts = []
+    for i in range(len(CONFIG_COLS)):
+        if config[i] != "":
+            parts.append(CONFIG_COLS[i] + "=" + config[i])
+    return " ".join(parts)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="compare two bench.py csv files")
+    ap.add_argument("baseline", help="csv from the reference version")
+    ap.add_argument("candidate", help="csv from the new version")
+    ap.add_argument("--threshold", type=float, default=5.0,
+                    help="percent change that counts as a regression (default 5)")
+    ap.add_argument("--confidence", type=float, default=0.95, choices=sorted(T_TABLE),
+                    help="confidence level of the intervals (default 0.95)")
+    ap.add_argument("--metric", action="append", choices=sorted(METRICS),
+                    help="metrics to judge (repeatable, default all present)")
+    args = ap.parse_args()
+
+    try:
+        base = load(args.baseline)
+        cand = load(args.candidate)
+    except (OSError, ValueError) as e:
+        print("[error] " + str(e))
+        sys.exit(2)
+
+    metrics = args.metric if args.metric else list(METRICS)
+
+    shared = []
+    for config in base:
+        if config in cand:
+            shared.append(config)
+    shared.sort(key=lambda c: (int(c[0] or 0), c[1:]))  # by node count, then the rest
+
+    if len(shared) == 0:
+        print("[error] no configuration is in both files")
+        sys.exit(2)
+
+    regressions = 0
+    print("config | metric | baseline mean | candidate mean | delta % | " +
+          format(args.confidence * 100, ".0f") + "% CI of delta % | verdict")
+
+    for config in shared:
+        for metric in metrics:
+            a = base[config].get(metric)
+            b = cand[config].get(metric)
+            if not a or not b:
+                continue
+            ma = mean_std(a)[0]
+            mb = mean_std(b)[0]
+            if ma == 0:
+                continue
+
+            higher_better = METRICS[metric]
+            delta = (mb - ma) / ma * 100.0
+            worse = -delta if higher_better else delta   # > 0 means the candidate is worse
+
+            ci = welch_interval(a, b, args.confidence)
+            if ci is None:
+                ci_text = "n/a (need 2+ repeats)"
+                significant = False
+            else:
+                lo = ci[0] / ma * 100.0
+                hi = ci[1] / ma * 100.0
+                ci_text = "[" + format(lo, "+.1f") + ", " + format(hi, "+.1f") + "]"
+                significant = lo > 0 or hi < 0  # interval does not contain 0
+
+            if worse > args.threshold and significant:
+                verdict = "REGRESSION"
+                regressions = regressions + 1
+            elif worse < -args.threshold and significant:
+                verdict = "improved"
+            elif abs(delta) > args.threshold:
+                verdict = "noise"  # big change but not significant over the repeats
+            else:
+                verdict = "ok"
+
+            print(config_name(config) + " | " + metric + " | " + format(ma, ".3f") + " (n=" + str(len(a)) + ") | " +
+                  format(mb, ".3f") + " (n=" + str(len(b)) + ") | " + format(delta, "+.1f") + " | " +
+                  ci_text + " | " + verdict)
+
+    only_base = len(base) - len(shared)
+    only_cand = len(cand) - len(shared)
+    if only_base > 0 or only_cand > 0:
+        print("[info] not compared: " + str(only_base) + " configs only in baseline, " +
+              str(only_cand) + " only in candidate")
+
+    if regressions > 0:
+        print("[FAIL] " + str(regressions) + " regression(s) over " + format(args.threshold, ".1f") + "%")
+        sys.exit(1)
+    print("[ok] no significant regression over " + format(args.threshold, ".1f") + "%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# ------ histogram.py
+# latency histogram with log buckets (HDR style): fixed memory whatever the number of samples
+# values are ints (bench.py records microseconds)
+#
+# values below SUB_COUNT get their own bucket (exact)
+# bigger values share a bucket with neighbours of the same magnitude:
+# every power of two range is cut in SUB_COUNT/2 equal pieces, so the error is at most 2/SUB_COUNT (< 0.8%)
+
+PRECISION_BITS = 8
+SUB_COUNT = 1 << PRECISION_BITS      # 256
+HALF_COUNT = SUB_COUNT // 2          # 128
+
+
+# ----------- bucket_of : bucket number for a value
+def bucket_of(value):
+    if value < SUB_COUNT:
+        return value
+    shift = value.bit_length() - PRECISION_BITS   # how many low bits are dropped
+    top = value >> shift                          # in [HALF_COUNT, SUB_COUNT)
+    return SUB_COUNT + (shift - 1) * HALF_COUNT + (top - HALF_COUNT)
+
+
+# ----------- bucket_range : (lowest, highest) value that falls in a bucket
+def bucket_range(bucket):
+    if bucket < SUB_COUNT:
+        return bucket, bucket
+    shift = (bucket - SUB_COUNT) // HALF_COUNT + 1
+    top = (bucket - SUB_COUNT) % HALF_COUNT + HALF_COUNT
+    low = top << shift
+    return low, low + (1 << shift) - 1
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = {}   # bucket -> count (sparse: only buckets that were hit)
+        self.count = 0
+        self.total = 0     # sum of values (mean)
+        self.min = None
+        self.max = 0
+
+    # ----------- record : add one sample (not thread safe: one histogram per worker, merge at the end)
+    def record(self, value):
+        value = int(value)
+        if value < 0:
+            value = 0
+        b = bucket_of(value)
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.count = self.count + 1
+        self.total = self.total + value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    # ----------- merge : add another histogram into this one (workers, repeats, processes)
+    def merge(self, other):
+        for b in other.counts:
+            self.counts[b] = self.counts.get(b, 0) + other.counts[b]
+        self.count = self.count + other.count
+        self.total = self.total + other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        return self
+
+    # ----------- percentile : value at q percent (0..100), bucket top clipped to the real max
+    def percentile(self, q):
+        if self.count == 0:
+            return 0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for b in sorted(self.counts):
+            seen = seen + self.counts[b]
+            if seen >= rank:
+                high = bucket_range(b)[1]
+                if high > self.max:
+                    high = self.max
+                return high
+        return self.max
+
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    # ----------- summary : the usual latency numbers
+    def summary(self):
+        out = {}
+        out["count"] = self.count
+        out["mean"] = self.mean()
+        out["p50"] = self.percentile(50)
+        out["p90"] = self.percentile(90)
+        out["p99"] = self.percentile(99)
+        out["p99.9"] = self.percentile(99.9)
+        out["max"] = self.max
+        return out
+
+    # ----------- to_dict / from_dict : plain json friendly form (send over a pipe, save to file)
+    def to_dict(self):
+        out = {}
+        out["counts"] = [[b, c] for b, c in sorted(self.counts.items())]
+        out["count"] = self.count
+        out["total"] = self.total
+        out["min"] = self.min
+        out["max"] = self.max
+        return out
+
+    @staticmethod
+    def from_dict(d):
+        h = Histogram()
+        for b, c in d["counts"]:
+            h.counts[b] = c
+        h.count = d["count"]
+        h.total = d["total"]
+        h.min = d["min"]
+        h.max = d["max"]
+        return h
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# ------ keyindex.py
+# keys ordered by ring id (hash_to_id(key)) so "all keys in (a, b]" is a bisect, not a full scan
+
+import bisect
+import threading
+
+from chord import hash_to_id, RING_SIZE
+
+# max entries per block before it is split in two
+# blocks keep inserts cheap (small list shift) while bisect on the block maxes keeps lookups O(log n)
+BLOCK_SIZE = 512
+
+
+class KeyIndex:
+    def __init__(self):
+        # blocks = list of sorted lists of (id, key), all ids in block i < all ids in block i+1
+        # maxes[i] = last (id, key) of blocks[i] (used to find the right block with bisect)
+        self.blocks = []
+        self.maxes = []
+        self.ids = {}  # key -> id, so we hash a key only once and know if it is present
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ----------- add : insert key (no-op if already there)
+    # key_id = hash_to_id(key) if the caller has it already (a PUT does), else hashed here,
+    # outside the lock
+    def add(self, key, key_id=None):
+        if key in self.ids:
+            return  # update of a known key: nothing to hash or insert
+        if key_id is None:
+            key_id = hash_to_id(key)
+        with self.lock:
+            if key in self.ids:
+                return  # another thread added it meanwhile
+            self.ids[key] = key_id
+            entry = (key_id, key)
+
+            if len(self.blocks) == 0:
+                self.blocks.append([entry])
+                self.maxes.append(entry)
+                return
+
+            b = bisect.bisect_left(self.maxes, entry)
+            if b == len(self.blocks):
+                b = b - 1  # bigger than everything: goes at the end of the last block
+
+            block = self.blocks[b]
+            bisect.insort(block, entry)
+            self.maxes[b] = block[-1]
+
+            # split a full block in two halves
+            if len(block) > BLOCK_SIZE:
+                half = len(block) // 2
+                self.blocks.insert(b + 1, block[half:])
+                self.maxes.insert(b + 1, block[-1])
+                del block[half:]
+                self.maxes[b] = block[-1]
+
+    # ----------- remove : drop key (no-op if missing)
+    def remove(self, key):
+        with self.lock:
+            key_id = self.ids.pop(key, None)
+            if key_id is None:
+                return
+            entry = (key_id, key)
+
+            b = bisect.bisect_left(self.maxes, entry)
+            block = self.blocks[b]
+            i = bisect.bisect_left(block, entry)
+            del block[i]
+
+            if len(block) == 0:
+                del self.blocks[b]
+                del self.maxes[b]
+            else:
+                self.maxes[b] = block[-1]
+
+    # ----------- _scan_from : append entries with id > after_id (and <= upto_id) until out has limit entries
+    # caller holds the lock
+    def _scan_from(self, after_id, upto_id, limit, out):
+        # (after_id, chr(0x10ffff)) sorts after every real key with that id
+        probe = (after_id, chr(0x10FFFF))
+        b = bisect.bisect_right(self.maxes, probe)
+
+        while b < len(self.blocks) and len(out) < limit:
+            block = self.blocks[b]
+            i = bisect.bisect_right(block, probe)
+            while i < len(block) and len(out) < limit:
+                entry = block[i]
+                if entry[0] > upto_id:
+                    return
+                out.append(entry)
+                i = i + 1
+            b = b + 1
+            probe = (-1, "")  # next blocks start from their first entry
+
+    # ----------- _rank : number of entries with id <= x
+    # caller holds the lock
+    def _rank(self, x):
+        probe = (x, chr(0x10FFFF))
+        b = bisect.bisect_right(self.maxes, probe)
+        count = 0
+        for i in range(b):
+            count = count + len(self.blocks[i])
+        if b < len(self.blocks):
+            count = count + bisect.bisect_right(self.blocks[b], probe)
+        return count
+
+    # ----------- count_in_range : how many keys have id in (start_id, end_id], without listing them
+    def count_in_range(self, start_id, end_id):
+        with self.lock:
+            if start_id < end_id:
+                return self._rank(end_id) - self._rank(start_id)
+            # wrap: (start, max] + [0, end]
+            return len(self.ids) - self._rank(start_id) + self._rank(end_id)
+
+    # ----------- page : keys with id in (start_id, end_id] in ring order, limit per call
+    # cursor = last id returned by the previous page (None for first page)
+    # returns (list of (id, key), next cursor or None when done)
+    # wrap interval (start >= end) is read in two pieces: (start, max] then [0, end]
+    def page(self, start_id, end_id, cursor=None, limit=1000):
+        out = []
+        with self.lock:
+            if start_id < end_id:
+                after = start_id if cursor is None else cursor
+                self._scan_from(after, end_id, limit, out)
+            else:
+                # first piece: above start (cursor is also above start while we are in it)
+                if cursor is None or cursor > start_id:
+                    after = start_id if cursor is None else cursor
+                    self._scan_from(after, float("inf"), limit, out)
+                    cursor = -1
+                # second piece: from 0 up to end
+                if len(out) < limit:
+                    self._scan_from(cursor, end_id, limit, out)
+
+        if len(out) < limit:
+            return out, None
+        return out, out[-1][0]
+
+    # ----------- keys_in_range : every key with id in (start_id, end_id] (full list, no paging)
+    def keys_in_range(self, start_id, end_id):
+        keys = []
+        cursor = None
+        while True:
+            entries, cursor = self.page(start_id, end_id, cursor, 4096)
+            for entry in entries:
+                keys.append(entry[1])
+            if cursor is None:
+                return keys
+
+
+# ----------- ScanIndex : same calls as KeyIndex, but keeps nothing per key
+# for --compact-store (server.py): a KeyIndex costs a key str, a 160 bit int and a tuple per key,
+# more than the arena saves. here every range call hashes all keys of the store instead
+# (O(n), only for handoff, /load and /internal/keys, not for GET/PUT)
+class ScanIndex:
+    def __init__(self, store):
+        self.store = store  # needs len() and keys()
+
+    def __len__(self):
+        return len(self.store)
+
+    def add(self, key, key_id=None):
+        return
+
+    def remove(self, key):
+        return
+
+    # ----------- _entries : (offset, id, key) of every key with id in (start_id, end_id]
+    # offset = place after start_id going round the ring (sorts a wrap interval in ring order)
+    def _entries(self, start_id, end_id):
+        arc = (end_id - start_id) % RING_SIZE
+        if arc == 0:
+            arc = RING_SIZE  # (x, x] = the whole ring, like KeyIndex
+        out = []
+        for key in self.store.keys():
+            key_id = hash_to_id(key)
+            offset = (key_id - start_id - 1) % RING_SIZE
+            if offset < arc:
+                out.append((offset, key_id, key))
+        return out
+
+    def count_in_range(self, start_id, end_id):
+        return len(self._entries(start_id, end_id))
+
+    def page(self, start_id, end_id, cursor=None, limit=1000):
+        entries = self._entries(start_id, end_id)
+        if cursor is not None:
+            after = (cursor - start_id - 1) % RING_SIZE
+            entries = [e for e in entries if e[0] > after]
+        entries.sort()
+        out = [(e[1], e[2]) for e in entries[:limit]]
+        if len(out) < limit:
+            return out, None
+        return out, out[-1][0]
+
+    def keys_in_range(self, start_id, end_id):
+        return [e[2] for e in self._entries(start_id, end_id)]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# loadgen.py
+# bench.py with M client processes: one python client is stuck at one core (GIL, http.client and
+# string building), far below what 16 nodes can serve
+# the coordinator starts --procs processes, each gets a share of the ops, records, concurrency and
+# rate and its own key space (k<run>p<proc>_<i>), all start every phase at the same time
+# histograms and counts come back through a pipe and are merged into the normal bench.py report
+# (same options, same csv columns, so compare.py works on the output)
+
+import sys
+import random
+import multiprocessing
+
+import bench
+from histogram import Histogram
+
+
+# ----------- share : part p of total split over procs (the first ones get the remainder)
+def share(total, p, procs):
+    part = total // procs
+    if p < total % procs:
+        part = part + 1
+    return part
+
+
+# ----------- child : one load process; waits for "go" before every phase, sends the results back
+def child(conn, args, spec, warmup, nodes, p, procs):
+    seed = None
+    if args.seed is not None:
+        seed = args.seed * 1000 + p
+    rng = random.Random(seed)
+
+    ops = share(args.ops, p, procs)
+    records = max(1, share(args.records, p, procs))
+    concurrency = max(1, share(args.concurrency, p, procs))
+    rate = args.rate / procs
+
+    try:
+        for run_idx in range(args.repeats):
+            phases = bench.build_phases(args, spec, str(run_idx) + "p" + str(p), ops, records, rng)
+            conn.send(len(phases))
+            for phase_ops in phases:
+                if conn.recv() != "go":
+                    return
+                dt, stats, excluded = bench.run_phase(phase_ops, nodes, concurrency, rate, warmup, args.window)
+                out = {}
+                for kind in stats:
+                    ok, total, hist, service = stats[kind]
+                    out[kind] = [ok, total, hist.to_dict(), service.to_dict()]
+                conn.send((dt, out, excluded))
+    finally:
+        conn.close()
+
+
+# ----------- merge : results of all processes for one phase -> (dt, stats, excluded) like run_phase
+# throughput = all ops / the slowest process (they started together)
+def merge(parts):
+    dt = 0.0
+    excluded = 0.0
+    stats = {}
+    for part_dt, part, part_excluded in parts:
+        dt = max(dt, part_dt)
+        excluded = max(excluded, part_excluded)
+        for kind in part:
+            ok, total, hist, service = part[kind]
+            if kind not in stats:
+                stats[kind] = [0, 0, Histogram(), Histogram()]
+            stats[kind][0] = stats[kind][0] + ok
+            stats[kind][1] = stats[kind][1] + total
+            stats[kind][2].merge(Histogram.from_dict(hist))
+            stats[kind][3].merge(Histogram.from_dict(service))
+    return dt, stats, excluded
+
+
+def main():
+    ap = bench.make_parser()
+    ap.description = "bench.py load spread over several client processes"
+    ap.add_argument("--procs", type=int, default=max(1, multiprocessing.cpu_count()),
+                    help="load generator processes (default: number of cpus); --concurrency and --rate are totals")
+    args = ap.parse_args()
+
+    if args.procs < 1:
+        print("[error] --procs must be 1 or more")
+        sys.exit(1)
+    warmup, mode, spec, workload_name = bench.check_args(args)
+    if args.concurrency < args.procs:
+        print("[warn] --concurrency " + str(args.concurrency) + " < --procs, every process still runs 1 worker")
+    nodes = bench.load_nodes(args)
+
+    bench.print_info(args, nodes, mode, spec)
+    print("[info] load processes: " + str(args.procs))
+    bench.open_csv(args.csv)
+    report = bench.Report(args, len(nodes), mode, workload_name)
+
+    procs = []
+    conns = []
+    for p in range(args.procs):
+        parent_end, child_end = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=child, args=(child_end, args, spec, warmup, nodes, p, args.procs),
+                                       daemon=True)
+        proc.start()
+        child_end.close()  # the child has its own copy
+        procs.append(proc)
+        conns.append(parent_end)
+
+    try:
+        for run_idx in range(args.repeats):
+            # every process has built its ops (nothing left to do before the timers start)
+            counts = []
+            for conn in conns:
+                counts.append(conn.recv())
+            for _ in range(counts[0]):
+                for conn in conns:
+                    conn.send("go")
+                parts = []
+                for conn in conns:
+                    parts.append(conn.recv())
+                dt, stats, excluded = merge(parts)
+                report.phase(run_idx, dt, stats, excluded)
+    except EOFError:
+        print("[error] a load process died")
+        sys.exit(1)
+    finally:
+        for proc in procs:
+            proc.join(timeout=5)
+
+    report.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# loadreport.py
+# how evenly is the work spread over the ring?
+# asks GET /load on every node at the same time (one thread per node) and prints per node:
+#   arc (part of the id ring the node owns), keys it owns, payload bytes, storage requests/s
+# and for every column: max, mean, max/mean (1.0 = perfectly even) and the Gini coefficient
+# (0 = all nodes equal, near 1 = one node has everything)
+# nodes come from --peers peers.json, the command line, or --crawl HOST:PORT (follows /network)
+
+import sys
+import json
+import argparse
+import threading
+import http.client
+
+COLUMNS = ("arc_fraction", "owned_keys", "bytes", "requests_per_s")
+
+
+# ----------- get_json : GET path on address, parsed reply or None
+def get_json(address, path, timeout):
+    conn = None
+    try:
+        conn = http.client.HTTPConnection(address, timeout=timeout)
+        conn.request("GET", path, None, {"Connection": "close"})
+        resp = conn.getresponse()
+        data = resp.read()
+        if resp.status != 200:
+            return None
+        return json.loads(data.decode("utf-8"))
+    except Exception:
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+# ----------- fetch_all : path from every address in parallel -> {address: reply or None}
+def fetch_all(addresses, path, timeout):
+    out = {}
+    threads = []
+
+    def one(address):
+        out[address] = get_json(address, path, timeout)
+
+    for address in addresses:
+        t = threading.Thread(target=one, args=(address,))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    return out
+
+
+# ----------- crawl : all nodes reachable from entry over /network (one level at a time, in parallel)
+def crawl(entry, timeout):
+    seen = set([entry])
+    level = [entry]
+    while len(level) > 0:
+        replies = fetch_all(level, "/network", timeout)
+        level = []
+        for address in replies:
+            neighbours = replies[address]
+            if neighbours is None:
+                continue
+            for n in neighbours:
+                if n not in seen:
+                    seen.add(n)
+                    level.append(n)
+    return sorted(seen)
+
+
+# ----------- gini : 0 = equal, (n-1)/n = one value has it all
+def gini(values):
+    n = len(values)
+    total = sum(values)
+    if n == 0 or total == 0:
+        return 0.0
+    ordered = sorted(values)
+    weighted = 0
+    for i in range(n):
+        weighted = weighted + (i + 1) * ordered[i]
+    return (2 * weighted) / (n * total) - (n + 1) / n
+
+
+# ----------- summary : max, mean, max/mean, min, gini of one column
+def summary(values):
+    out = {}
+    if len(values) == 0:
+        return out
+    mean = sum(values) / len(values)
+    out["max"] = max(values)
+    out["mean"] = mean
+    out["max_over_mean"] = max(values) / mean if mean > 0 else None
+    out["min"] = min(values)
+    out["gini"] = gini(values)
+    return out
+
+
+def fmt(v):
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        return "{:.4g}".format(v)
+    return str(v)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="load and skew over all chord nodes (GET /load)")
+    ap.add_argument("nodes", nargs="*", help="HOST:PORT of the nodes")
+    ap.add_argument("--peers", default="", help="peers.json with the node list")
+    ap.add_argument("--crawl", default="", help="HOST:PORT of one node, find the others through /network")
+    ap.add_argument("--timeout", type=float, default=3.0, help="seconds per request (default 3)")
+    ap.add_argument("--json", action="store_true", help="print one json object instead of the table")
+    args = ap.parse_args()
+
+    nodes = list(args.nodes)
+    if args.peers != "":
+        try:
+            f = open(args.peers, "r", encoding="utf-8")
+            nodes = nodes + [str(a) for a in json.loads(f.read())]
+            f.close()
+        except Exception:
+            print("[error] cannot read peers file: " + args.peers)
+            sys.exit(2)
+    if args.crawl != "":
+        nodes = nodes + crawl(args.crawl, args.timeout)
+    nodes = sorted(set(nodes))
+    if len(nodes) == 0:
+        print("[error] no nodes (list them, use --peers peers.json or --crawl HOST:PORT)")
+        sys.exit(2)
+
+    replies = fetch_all(nodes, "/load", args.timeout)
+    rows = []
+    missing = []
+    for address in nodes:
+        if replies[address] is None:
+            missing.append(address)
+        else:
+            rows.append(replies[address])
+
+    stats = {}
+    for col in COLUMNS:
+        stats[col] = summary([row[col] for row in rows])
+
+    if args.json:
+        print(json.dumps({"nodes": rows, "missing": missing, "summary": stats}, indent=2))
+    else:
+        # ring order (by id), so neighbours with big and small arcs are next to each other
+        rows.sort(key=lambda row: int(row["self_id"]))
+        print("{:<24} {:>10} {:>10} {:>12} {:>10}".format("node", "arc", "keys", "bytes", "req/s"))
+        for row in rows:
+            print("{:<24} {:>10} {:>10} {:>12} {:>10}".format(row["node"], fmt(row["arc_fraction"]),
+                  row["owned_keys"], row["bytes"], fmt(row["requests_per_s"])))
+        print("")
+        print("{:<16} {:>10} {:>10} {:>10} {:>10} {:>8}".format("", "max", "mean", "max/mean", "min", "gini"))
+        for col in COLUMNS:
+            s = stats[col]
+            if len(s) == 0:
+                continue
+            print("{:<16} {:>10} {:>10} {:>10} {:>10} {:>8}".format(col, fmt(s["max"]), fmt(s["mean"]),
+                  fmt(s["max_over_mean"]), fmt(s["min"]), fmt(s["gini"])))
+        for address in missing:
+            print("[warn] no /load reply from " + address)
+
+    if len(missing) > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
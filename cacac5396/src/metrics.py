@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# ------ metrics.py
+# counters and latency histograms for GET /metrics (Prometheus text format 0.0.4)
+#
+# cheap updates: the numbers live in SHARD_COUNT shards, a thread always writes to the shard of its
+# thread id (its own lock, almost never waited on), /metrics adds the shards together when read
+# (server.py makes one thread per connection, so one dict per thread would leak a dict per request)
+
+import time
+import threading
+
+SHARD_COUNT = 16
+
+# latency buckets in seconds (upper bounds, +Inf is added)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# ----------- RateCounter : events per second over the last seconds (one slot per second, reused)
+# increments from many threads may lose a count now and then, fine for a rate
+class RateCounter:
+    def __init__(self, seconds=60):
+        self.counts = [0] * seconds
+        self.stamps = [0] * seconds
+
+    def hit(self):
+        sec = int(time.monotonic())
+        i = sec % len(self.counts)
+        if self.stamps[i] != sec:
+            self.stamps[i] = sec
+            self.counts[i] = 0
+        self.counts[i] = self.counts[i] + 1
+
+    # ----------- rate : average over the last window full seconds (the running second is left out)
+    def rate(self, window=10):
+        window = min(window, len(self.counts) - 1)
+        now = int(time.monotonic())
+        total = 0
+        for sec in range(now - window, now):
+            i = sec % len(self.counts)
+            if self.stamps[i] == sec:
+                total = total + self.counts[i]
+        return total / window
+
+
+class Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}   # (name, labels) -> number
+        self.hists = {}      # (name, labels) -> [count per bucket..., +Inf count, sum]
+
+
+# ----------- escape : label value as Prometheus wants it
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ----------- label_text : (("route", "/storage"), ("status", "200")) -> {route="/storage",status="200"}
+def label_text(labels, extra=None):
+    parts = []
+    for k, v in labels:
+        parts.append(k + '="' + escape(v) + '"')
+    if extra is not None:
+        parts.append(extra)
+    if len(parts) == 0:
+        return ""
+    return "{" + ",".join(parts) + "}"
+
+
+def format_value(v):
+    if isinstance(v, float):
+        return repr(v)
+    return str(v)
+
+
+class Metrics:
+    def __init__(self):
+        self.shards = []
+        for _ in range(SHARD_COUNT):
+            self.shards.append(Shard())
+        self.help = {}  # name -> (type, help text), in the order they were described
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def _shard(self):
+        return self.shards[threading.get_native_id() % SHARD_COUNT]
+
+    # ----------- inc : counter (or a gauge kept as a sum of +/- changes) += value
+    def inc(self, name, labels=(), value=1):
+        shard = self._shard()
+        key = (name, labels)
+        with shard.lock:
+            shard.counters[key] = shard.counters.get(key, 0) + value
+
+    # ----------- observe : one latency sample in seconds
+    def observe(self, name, labels, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i = i + 1
+        shard = self._shard()
+        key = (name, labels)
+        with shard.lock:
+            h = shard.hists.get(key)
+            if h is None:
+                h = [0] * (len(BUCKETS) + 2)
+                shard.hists[key] = h
+            h[i] = h[i] + 1
+            h[-1] = h[-1] + seconds
+
+    # ----------- value : one counter summed over the shards
+    def value(self, name, labels=()):
+        total = 0
+        for shard in self.shards:
+            with shard.lock:
+                total = total + shard.counters.get((name, labels), 0)
+        return total
+
+    # ----------- merged : all shards added together
+    def merged(self):
+        counters = {}
+        hists = {}
+        for shard in self.shards:
+            with shard.lock:
+                for key in shard.counters:
+                    counters[key] = counters.get(key, 0) + shard.counters[key]
+                for key in shard.hists:
+                    if key not in hists:
+                        hists[key] = [0] * (len(BUCKETS) + 2)
+                    into = hists[key]
+                    h = shard.hists[key]
+                    for i in range(len(h)):
+                        into[i] = into[i] + h[i]
+        return counters, hists
+
+    # ----------- render : text for /metrics; gauges = [(name, help, labels, value)] read right now
+    def render(self, gauges=()):
+        counters, hists = self.merged()
+
+        # group series by metric name so every name gets one HELP/TYPE block
+        series = {}
+        for name, labels in counters:
+            series.setdefault(name, []).append(labels)
+        hist_series = {}
+        for name, labels in hists:
+            hist_series.setdefault(name, []).append(labels)
+
+        lines = []
+        for name in self.help:
+            kind, text = self.help[name]
+            if name not in series and name not in hist_series:
+                continue
+            lines.append("# HELP " + name + " " + text)
+            lines.append("# TYPE " + name + " " + kind)
+            for labels in sorted(series.get(name, [])):
+                lines.append(name + label_text(labels) + " " + format_value(counters[(name, labels)]))
+            for labels in sorted(hist_series.get(name, [])):
+                h = hists[(name, labels)]
+                running = 0
+                for i in range(len(BUCKETS)):
+                    running = running + h[i]
+                    lines.append(name + "_bucket" + label_text(labels, 'le="' + repr(BUCKETS[i]) + '"') + " " + str(running))
+                running = running + h[len(BUCKETS)]
+                lines.append(name + "_bucket" + label_text(labels, 'le="+Inf"') + " " + str(running))
+                lines.append(name + "_sum" + label_text(labels) + " " + repr(h[-1]))
+                lines.append(name + "_count" + label_text(labels) + " " + str(running))
+
+        done = set()
+        for name, text, labels, value in gauges:
+            if name not in done:
+                lines.append("# HELP " + name + " " + text)
+                lines.append("# TYPE " + name + " gauge")
+                done.add(name)
+            lines.append(name + label_text(labels) + " " + format_value(value))
+
+        return "\n".join(lines) + "\n"
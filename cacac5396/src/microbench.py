@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# microbench.py
+# CPU cost of the pure routing code in chord.py (no network, no server)
+# every case is a loop(n) function that does n operations; the iteration count is calibrated
+# (doubled until one run takes --min-time), one warmup run, then --repeats timed runs
+# output: table on stdout, --json FILE for machine readable results (compare between commits)
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+import chord
+from chord import ChordNode
+
+DEFAULT_SIZES = "1,10,100,1000,10000,100000"
+INPUTS = 1024  # inputs per case (power of 2, index with i & MASK)
+MASK = INPUTS - 1
+
+
+# ----------- synthetic_addresses : n fake "host:port" addresses (same shape as the real ones)
+def synthetic_addresses(n):
+    out = []
+    for i in range(n):
+        out.append("c" + str(i // 100) + "-" + str(i % 100) + ":" + str(50000 + i % 10000))
+    return out
+
+
+def random_ids(rng, count):
+    ids = []
+    for _ in range(count):
+        ids.append(rng.getrandbits(chord.M_BITS))
+    return ids
+
+
+# ----------- cases : (name, ring_size or None, loop function)
+def flat_cases(rng):
+    cases = []
+
+    keys = []
+    for i in range(INPUTS):
+        keys.append("k0_" + str(i))
+
+    def hash_loop(n):
+        hash_to_id = chord.hash_to_id
+        for i in range(n):
+            hash_to_id(keys[i & MASK])
+    cases.append(("hash_to_id", None, hash_loop))
+
+    a = random_ids(rng, INPUTS)
+    b = random_ids(rng, INPUTS)
+    c = random_ids(rng, INPUTS)
+
+    def interval_loop(n):
+        f = chord.in_interval_open_closed
+        for i in range(n):
+            j = i & MASK
+            f(a[j], b[j], c[j])
+    cases.append(("in_interval_open_closed", None, interval_loop))
+
+    def finger_loop(n):
+        f = chord.finger_in_open_interval
+        for i in range(n):
+            j = i & MASK
+            f(a[j], b[j], c[j])
+    cases.append(("finger_in_open_interval", None, finger_loop))
+    return cases
+
+
+def ring_cases(rng, size):
+    cases = []
+    peers = synthetic_addresses(size)
+
+    def fingers_loop(n):
+        f = chord.how_many_fingers
+        for _ in range(n):
+            f(size)
+    cases.append(("how_many_fingers", size, fingers_loop))
+
+    def init_loop(n):
+        for i in range(n):
+            ChordNode(peers[i % size], peers)
+    cases.append(("ChordNode.__init__", size, init_loop))
+
+    node = ChordNode(peers[0], peers)
+    targets = random_ids(rng, INPUTS)
+
+    def step_loop(n):
+        step = node.shortcut_step
+        for i in range(n):
+            step(targets[i & MASK])
+    cases.append(("shortcut_step", size, step_loop))
+
+    def responsible_loop(n):
+        f = node.is_responsible
+        for i in range(n):
+            f(targets[i & MASK])
+    cases.append(("is_responsible", size, responsible_loop))
+    return cases
+
+
+def timed(loop, n):
+    t0 = time.perf_counter_ns()
+    loop(n)
+    return time.perf_counter_ns() - t0
+
+
+# ----------- calibrate : smallest power of 2 iteration count that runs at least min_time
+def calibrate(loop, min_time_ns):
+    n = 1
+    while True:
+        took = timed(loop, n)
+        if took >= min_time_ns:
+            return n
+        if took <= 0:
+            n = n * 16
+        else:
+            # jump close to the target, then keep doubling (fewer slow calibration rounds)
+            guess = int(n * min_time_ns / took)
+            n = max(n * 2, 1 << (guess.bit_length() - 1))
+
+
+def measure(loop, min_time_ns, repeats):
+    n = calibrate(loop, min_time_ns)
+    timed(loop, n)  # warmup (caches, allocator)
+    per_op = []
+    for _ in range(repeats):
+        per_op.append(timed(loop, n) / n)
+    per_op.sort()
+    out = {}
+    out["iterations"] = n
+    out["repeats"] = repeats
+    out["ns_per_op"] = per_op[len(per_op) // 2]  # median
+    out["min_ns"] = per_op[0]
+    out["max_ns"] = per_op[-1]
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="microbenchmarks for chord.py")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="ring sizes, comma separated (default " + DEFAULT_SIZES + ")")
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per timed run (default 0.2)")
+    ap.add_argument("--repeats", type=int, default=5, help="timed runs per case, median is reported (default 5)")
+    ap.add_argument("--only", default="", help="run only cases whose name contains this text")
+    ap.add_argument("--seed", type=int, default=1, help="random seed for the inputs")
+    ap.add_argument("--json", default="", help="write results to this file")
+    args = ap.parse_args()
+
+    sizes = []
+    for part in args.sizes.split(","):
+        if part.strip() != "":
+            sizes.append(int(part))
+    if args.repeats < 1 or args.min_time <= 0:
+        print("[error] --repeats must be >= 1 and --min-time > 0")
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    min_time_ns = int(args.min_time * 1e9)
+
+    results = []
+    print("case,ring_size,iterations,ns_per_op,min_ns,max_ns")
+
+    def run(cases):
+        for name, size, loop in cases:
+            if args.only != "" and args.only not in name:
+                continue
+            r = measure(loop, min_time_ns, args.repeats)
+            r["name"] = name
+            r["ring_size"] = size
+            results.append(r)
+            print(name + "," + ("" if size is None else str(size)) + "," + str(r["iterations"]) + "," +
+                  format(r["ns_per_op"], ".1f") + "," + format(r["min_ns"], ".1f") + "," + format(r["max_ns"], ".1f"))
+            sys.stdout.flush()
+
+    run(flat_cases(rng))
+    for size in sizes:
+        if size < 1:
+            continue
+        run(ring_cases(rng, size))
+
+    if args.json != "":
+        out = {}
+        out["python"] = platform.python_version()
+        out["machine"] = platform.machine()
+        out["min_time_s"] = args.min_time
+        out["seed"] = args.seed
+        out["results"] = results
+        f = open(args.json, "w", encoding="utf-8")
+        json.dump(out, f, indent=1)
+        f.write("\n")
+        f.close()
+        print("[info] results written to " + args.json)
+
+
+if __name__ == "__main__":
+    main()
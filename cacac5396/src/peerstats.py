@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# ------ peerstats.py
+# what _forward learns about every next hop: round trip time, errors, requests in flight
+#   rtt: EWMA of the reply time + EWMA of its deviation (like TCP's srtt / rttvar)
+#   timeout for the next forward = srtt + 4 * rttvar, kept between MIN_TIMEOUT and MAX_TIMEOUT
+#   (MAX_TIMEOUT until there are samples, the old fixed value)
+#   degraded = DEGRADED_AFTER failures in a row; such a peer is skipped by routing for RETRY_AFTER
+#   seconds, then gets traffic again (one good reply clears it)
+#   limit: at most limit forwards in flight per peer, at most max_waiting more wait for a slot;
+#   a forward that finds the queue full, or would not get a slot in time to finish before its
+#   deadline, is rejected at once (server.py answers 503) instead of holding a thread on a slow peer
+# note: the rtt of a forward includes every hop after the peer, so it is a "route via this peer" time
+
+import time
+import threading
+
+ALPHA = 0.125           # weight of a new rtt sample (TCP values)
+BETA = 0.25             # weight of a new deviation sample
+ERROR_ALPHA = 0.1       # weight of a new ok/fail sample in the error rate
+# the rtt of a forward includes every later hop and its queueing: with a ~2 ms srtt a loaded but
+# healthy route still has a p99 above 1 s (README, concurrency 64), so the floor stays well above that
+MIN_TIMEOUT = 3.0
+MAX_TIMEOUT = 5.0
+DEGRADED_AFTER = 3
+RETRY_AFTER = 5.0
+
+
+class Peer:
+    def __init__(self, address, lock):
+        self.address = address
+        self.slot_free = threading.Condition(lock)  # notified when a forward ends
+        self.srtt = None       # seconds
+        self.rttvar = 0.0
+        self.error_rate = 0.0  # EWMA of 1 = failed, 0 = ok
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.fail_streak = 0
+        self.last_failure = 0.0  # monotonic time
+
+
+class PeerTable:
+    def __init__(self, limit=0, max_waiting=0):
+        self.lock = threading.Lock()
+        self.peers = {}
+        self.limit = limit              # 0 = no limit
+        self.max_waiting = max_waiting
+
+    def _peer(self, address):
+        p = self.peers.get(address)
+        if p is None:
+            p = Peer(address, self.lock)
+            self.peers[address] = p
+        return p
+
+    # ----------- begin / end : around one forward (end exactly once, ok = got a reply)
+    # begin waits for a slot; deadline = perf_counter time the reply is needed by (None = no deadline)
+    # returns the start time, or None = rejected (no end call then)
+    def begin(self, address, deadline=None):
+        with self.lock:
+            p = self._peer(address)
+            if self.limit > 0 and p.in_flight >= self.limit:
+                if not self._wait_slot(p, deadline):
+                    p.rejected += 1
+                    return None
+            p.in_flight += 1
+        return time.perf_counter()
+
+    # ----------- _wait_slot : (lock held) True once a slot is free, False if not worth waiting
+    # the forward itself takes ~srtt, so the slot must come before deadline - srtt; the wait is
+    # guessed as (place in the queue / limit) * srtt (limit forwards end every srtt)
+    def _wait_slot(self, p, deadline):
+        if p.waiting >= self.max_waiting:
+            return False
+        srtt = p.srtt if p.srtt is not None else 0.0
+        latest = None
+        if deadline is not None:
+            latest = deadline - srtt
+            guess = (p.waiting + 1) / self.limit * srtt
+            if time.perf_counter() + guess > latest:
+                return False
+        p.waiting += 1
+        try:
+            while p.in_flight >= self.limit:
+                if latest is None:
+                    p.slot_free.wait()
+                    continue
+                left = latest - time.perf_counter()
+                if left <= 0:
+                    return False
+                p.slot_free.wait(left)
+            return True
+        finally:
+            p.waiting -= 1
+
+    def end(self, address, t0, ok):
+        rtt = time.perf_counter() - t0
+        with self.lock:
+            p = self._peer(address)
+            p.in_flight -= 1
+            p.slot_free.notify()
+            p.requests += 1
+            if ok:
+                if p.srtt is None:
+                    p.srtt = rtt
+                    p.rttvar = rtt / 2
+                else:
+                    p.rttvar = (1 - BETA) * p.rttvar + BETA * abs(p.srtt - rtt)
+                    p.srtt = (1 - ALPHA) * p.srtt + ALPHA * rtt
+                p.error_rate = (1 - ERROR_ALPHA) * p.error_rate
+                p.fail_streak = 0
+            else:
+                p.errors += 1
+                p.error_rate = (1 - ERROR_ALPHA) * p.error_rate + ERROR_ALPHA
+                p.fail_streak += 1
+                p.last_failure = time.monotonic()
+
+    # ----------- timeout : seconds to wait for this peer
+    def timeout(self, address):
+        p = self.peers.get(address)
+        if p is None or p.srtt is None:
+            return MAX_TIMEOUT
+        t = p.srtt + 4 * p.rttvar
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, t))
+
+    # ----------- usable : False while a peer keeps failing (routing picks another finger)
+    def usable(self, address):
+        p = self.peers.get(address)
+        if p is None or p.fail_streak < DEGRADED_AFTER:
+            return True
+        return time.monotonic() - p.last_failure >= RETRY_AFTER
+
+    # ----------- snapshot : list of dicts for GET /peers, slowest first
+    def snapshot(self):
+        out = []
+        with self.lock:
+            for p in self.peers.values():
+                d = {}
+                d["peer"] = p.address
+                d["rtt_ms"] = None if p.srtt is None else round(p.srtt * 1000, 3)
+                d["rtt_dev_ms"] = round(p.rttvar * 1000, 3)
+                d["timeout_s"] = round(self.timeout(p.address), 3)
+                d["error_rate"] = round(p.error_rate, 4)
+                d["in_flight"] = p.in_flight
+                d["waiting"] = p.waiting
+                d["requests"] = p.requests
+                d["errors"] = p.errors
+                d["rejected"] = p.rejected
+                d["fail_streak"] = p.fail_streak
+                d["degraded"] = not self.usable(p.address)
+                out.append(d)
+        out.sort(key=lambda d: -(d["rtt_ms"] or 0))
+        return out
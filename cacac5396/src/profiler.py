@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# ------ profiler.py
+# sampling profiler for a running server.py (no restart, no extra package)
+# every interval it reads the current frame of every thread (sys._current_frames) and counts the
+# stacks; the result is in "collapsed" format, one line per stack: root;caller;callee count
+# (flamegraph.pl, speedscope and inferno read it directly)
+# cost: one walk over the thread stacks per sample, the profiled threads are never stopped
+
+import os
+import sys
+import time
+import threading
+import traceback
+
+MAX_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+
+# only one profile at a time (two would double the overhead and share nothing)
+PROFILE_LOCK = threading.Lock()
+
+
+# file name -> short name ("server.py", but "http/server.py" for a file inside a package)
+SHORT_NAMES = {}
+
+
+def short_name(filename):
+    name = SHORT_NAMES.get(filename)
+    if name is None:
+        name = os.path.basename(filename)
+        folder = os.path.dirname(filename)
+        if os.path.exists(os.path.join(folder, "__init__.py")):
+            name = os.path.basename(folder) + "/" + name
+        SHORT_NAMES[filename] = name
+    return name
+
+
+# ----------- frame_label : "file.py:function" (line numbers left out so a function is one box)
+def frame_label(frame):
+    code = frame.f_code
+    return short_name(code.co_filename) + ":" + code.co_name
+
+
+# ----------- stack_of : root first, callee last, joined with ";"
+def stack_of(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+# ----------- sample : {collapsed stack: samples} over all threads except the caller
+# idle threads (blocked in accept, select or a queue get) are sampled too, so waiting shows up
+def sample(seconds, interval=0.005):
+    me = threading.get_ident()
+    counts = {}
+    taken = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        frames = sys._current_frames()
+        for ident in frames:
+            if ident == me:
+                continue
+            stack = stack_of(frames[ident])
+            counts[stack] = counts.get(stack, 0) + 1
+        frames = None  # do not keep the frames alive until the next sample
+        taken = taken + 1
+        time.sleep(interval)
+    return counts, taken
+
+
+# ----------- collapsed : text in collapsed stack format, biggest first
+def collapsed(counts):
+    lines = []
+    for stack in sorted(counts, key=lambda s: -counts[s]):
+        lines.append(stack + " " + str(counts[stack]))
+    return "\n".join(lines) + "\n"
+
+
+# ----------- profile : sample with the limits applied, None if another profile is running
+def profile(seconds, interval=0.005):
+    seconds = min(max(seconds, 0.0), MAX_SECONDS)
+    interval = max(interval, MIN_INTERVAL)
+    if not PROFILE_LOCK.acquire(blocking=False):
+        return None
+    try:
+        counts, taken = sample(seconds, interval)
+    finally:
+        PROFILE_LOCK.release()
+    header = "# samples " + str(taken) + " interval_ms " + format(interval * 1000, ".1f") + "\n"
+    return header + collapsed(counts)
+
+
+# ----------- thread_stacks : current stack of every thread, like a python traceback
+def thread_stacks():
+    names = {}
+    for t in threading.enumerate():
+        names[t.ident] = t.name + (" (daemon)" if t.daemon else "")
+
+    frames = sys._current_frames()
+    out = []
+    out.append("# threads " + str(len(frames)) + "\n")
+    for ident in sorted(frames):
+        out.append("\n--- " + names.get(ident, "unknown") + " ident " + str(ident) + "\n")
+        out.append("".join(traceback.format_stack(frames[ident])))
+    return "".join(out)
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import math
 import signal
 import socket
 
@@ -9,20 +11,76 @@ import http.server
 import socketserver
 import http.client
 import json
-from urllib.parse import urlsplit
-
-from chord import ChordNode, hash_to_id  # chord main algo
+import time
+import queue
+import random
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+from chord import ChordNode, hash_to_id, RING_SIZE  # chord main algo
+import transfer  # framed key range streaming
+from keyindex import KeyIndex, ScanIndex  # keys sorted by ring id
+from cache import ReadCache  # hot key cache on non owners
+from arena import ArenaStore  # compact storage for many small values
+import profiler  # /debug/profile and /debug/threads
+from metrics import Metrics, RateCounter  # counters for /metrics, request rate for /load
+import tracing  # per hop timing of requests
+from accesslog import AccessLog  # json lines request log, written by a background thread
+from peerstats import PeerTable  # rtt / errors per next hop, adaptive timeouts
+import workers  # --workers: several processes on one port, supervisor
+from singleflight import SingleFlight  # one forward for concurrent GETs of the same key
 
 # get name
 HOSTNAME = socket.gethostname().split(".")[0]
 
-# arg check
-if len(sys.argv) not in (2, 3):
-    print("usage: python3 server.py <port> [<peers_json>]")
-    sys.exit(1)
+# arg check (port and peers are positional, extra features are --options)
+ap = argparse.ArgumentParser(usage="python3 server.py <port> [<peers_json>] [options]")
+ap.add_argument("port")
+ap.add_argument("peers", nargs="?", default=None)
+ap.add_argument("--replicas", type=int, default=0,
+                help="extra copies of each key kept on the next successors (default 0)")
+ap.add_argument("--compact-store", action="store_true",
+                help="keep keys and values packed in a bytearray arena instead of a dict")
+ap.add_argument("--cache-size", type=int, default=0,
+                help="max cached values for keys owned by other nodes (default 0 = off)")
+ap.add_argument("--cache-ttl", type=float, default=1.0,
+                help="seconds a cached value may be served (default 1.0)")
+ap.add_argument("--cache-push", action="store_true",
+                help="owner pushes invalidations to nodes that cached a key when it is PUT")
+ap.add_argument("--trace-sample", type=float, default=0.01,
+                help="share of storage requests without a trace id that get one here (default 0.01)")
+ap.add_argument("--trace-buffer", type=int, default=10000,
+                help="trace records kept in memory (default 10000, oldest dropped)")
+ap.add_argument("--access-log", default="",
+                help="write one JSON line per request to this file (default off)")
+ap.add_argument("--access-log-sample", type=float, default=1.0,
+                help="share of requests written to the access log (default 1.0 = all)")
+ap.add_argument("--access-log-max-mb", type=float, default=64.0,
+                help="rotate the access log at this size (default 64)")
+ap.add_argument("--access-log-backups", type=int, default=3,
+                help="rotated access logs kept (default 3)")
+ap.add_argument("--debug", action="store_true",
+                help="enable /debug/profile and /debug/threads (off by default: shows code internals)")
+ap.add_argument("--peer-limit", type=int, default=32,
+                help="max forwards in flight to one next hop (default 32, 0 = no limit)")
+ap.add_argument("--peer-queue", type=int, default=64,
+                help="max forwards waiting for a slot to one next hop, more get 503 (default 64)")
+ap.add_argument("--deadline", type=float, default=5.0,
+                help="seconds a storage request may take over all hops (default 5)")
+ap.add_argument("--no-coalesce", action="store_true",
+                help="forward every GET on its own (default: concurrent GETs of one key share one forward)")
+ap.add_argument("--workers", type=int, default=1,
+                help="worker processes sharing the port, each owns a slice of this node's keys (default 1)")
+ap.add_argument("--state-dir", default="",
+                help="on stop save the keys to a file here and load them on start (default: hand them to the successor)")
+ap.add_argument("--drain-timeout", type=float, default=10.0,
+                help="on stop, seconds to wait for running requests before saving the keys (default 10)")
+ap.add_argument("--worker-index", type=int, default=-1, help=argparse.SUPPRESS)  # set by the supervisor
+ap.add_argument("--worker-ports", default="", help=argparse.SUPPRESS)         # private ports of all workers
+ARGS = ap.parse_args()
 
 try:
-    PORT = int(sys.argv[1])  # convert
+    PORT = int(ARGS.port)  # convert
     if not (49152 <= PORT <= 65535):
         raise ValueError
 except ValueError:
@@ -33,33 +91,434 @@ except ValueError:
 PEERS = []
 
 # check if peers were given
-if len(sys.argv) == 3:
+if ARGS.peers is not None:
     try:
-        PEERS = json.loads(sys.argv[2])
+        PEERS = json.loads(ARGS.peers)
         if type(PEERS) != list:
             raise ValueError
     except Exception:
         print("error: peers list not valid")
         sys.exit(1)
 
+if ARGS.replicas < 0:
+    print("error: --replicas must be 0 or more")
+    sys.exit(1)
+
+if not (0.0 <= ARGS.trace_sample <= 1.0) or ARGS.trace_buffer < 1:
+    print("error: --trace-sample must be in 0-1 and --trace-buffer 1 or more")
+    sys.exit(1)
+
+if not (0.0 <= ARGS.access_log_sample <= 1.0) or ARGS.access_log_max_mb <= 0 or ARGS.access_log_backups < 0:
+    print("error: --access-log-sample must be in 0-1, --access-log-max-mb more than 0, --access-log-backups 0 or more")
+    sys.exit(1)
+
+if ARGS.cache_size < 0 or ARGS.cache_ttl <= 0:
+    print("error: --cache-size must be 0 or more and --cache-ttl more than 0")
+    sys.exit(1)
+
+if ARGS.workers < 1:
+    print("error: --workers must be 1 or more")
+    sys.exit(1)
+if ARGS.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+    print("error: --workers needs SO_REUSEPORT (linux / bsd)")
+    sys.exit(1)
+
+if ARGS.peer_limit < 0 or ARGS.peer_queue < 0 or ARGS.deadline <= 0:
+    print("error: --peer-limit and --peer-queue must be 0 or more, --deadline more than 0")
+    sys.exit(1)
+
+if ARGS.drain_timeout < 0:
+    print("error: --drain-timeout must be 0 or more")
+    sys.exit(1)
+if ARGS.state_dir != "" and not os.path.isdir(ARGS.state_dir):
+    print("error: --state-dir " + ARGS.state_dir + " is not a directory")
+    sys.exit(1)
+
+# --workers W: this first process only starts and watches the W workers (they do the serving)
+# (on stop they get drain time + 20s to finish requests and save their keys before KILL)
+if ARGS.workers > 1 and ARGS.worker_index < 0:
+    sys.exit(workers.supervise(sys.argv[0], sys.argv[1:], ARGS.workers, ARGS.drain_timeout + 20))
+
+# private address of every worker, by index (empty with one process)
+WORKER_ADDRS = []
+if ARGS.workers > 1:
+    try:
+        for p in ARGS.worker_ports.split(","):
+            WORKER_ADDRS.append("127.0.0.1:" + str(int(p)))
+        if len(WORKER_ADDRS) != ARGS.workers or not (0 <= ARGS.worker_index < ARGS.workers):
+            raise ValueError
+    except ValueError:
+        print("error: --worker-index / --worker-ports do not match --workers")
+        sys.exit(1)
+
 # make my address (name:port)
 SELF_ADDR = HOSTNAME + ":" + str(PORT)
 
-# create chord node (knows id, pred, succ, fingers)
-CHORD = ChordNode(SELF_ADDR, PEERS)
-
-# empty storage for key-values
-STORE = {}
+# create chord node (knows id, pred, succ, fingers, replicas)
+CHORD = ChordNode(SELF_ADDR, PEERS, ARGS.replicas)
+
+# --state-dir: keys saved on stop, loaded on start (one file per node, and per worker)
+STATE_FILE = None
+if ARGS.state_dir != "":
+    name = "state-" + HOSTNAME + "-" + str(PORT)
+    if ARGS.workers > 1:
+        name = name + ".w" + str(ARGS.worker_index)
+    STATE_FILE = os.path.join(ARGS.state_dir, name + ".frames")
+
+# empty storage for key-values (owned keys and replica copies)
+# --compact-store: same dict like interface, much less memory per small value (see store-bench.py)
+if ARGS.compact_store:
+    STORE = ArenaStore()
+else:
+    STORE = {}
+
+# version of each value in STORE (sent with GET replies so caches can tell old from new)
+# --compact-store: kept by the arena next to the value (VERSIONS stays empty)
+VERSIONS = {}
+VERSION_LOCK = threading.Lock()
+LAST_VERSION = [0]
+
+# ----------- next_version : increasing number, based on the clock so it keeps growing after a restart
+def next_version():
+    with VERSION_LOCK:
+        v = time.time_ns()
+        if v <= LAST_VERSION[0]:
+            v = LAST_VERSION[0] + 1
+        LAST_VERSION[0] = v
+        return v
+
+# same keys sorted by ring id (range handoff and scans without hashing every key)
+# --compact-store: no sorted copy of the keys (it would cost more per key than the arena saves),
+# range calls hash every stored key instead
+if ARGS.compact_store:
+    KEY_INDEX = ScanIndex(STORE)
+else:
+    KEY_INDEX = KeyIndex()
+
+# ----------- metrics for GET /metrics (updates go to per thread shards, summed when read)
+METRICS = Metrics()
+METRICS.describe("chord_requests_total", "counter", "HTTP requests by route, method and status")
+METRICS.describe("chord_request_seconds", "histogram", "time to handle one request, by route and method")
+METRICS.describe("chord_storage_requests_total", "counter",
+                 "storage requests by how they were answered (owner, replica, cache, forwarded, worker, coalesced, replica_copy)")
+METRICS.describe("chord_forward_seconds", "histogram", "time until the next hop replied, by peer")
+METRICS.describe("chord_forward_errors_total", "counter", "forwards that failed (connect, timeout, bad reply), by peer")
+METRICS.describe("chord_forward_rejected_total", "counter",
+                 "forwards not sent (503): peer at its limit with a full queue, or no time left before the deadline")
+METRICS.describe("chord_connections_active", "gauge", "connections being handled right now")
+METRICS.describe("chord_store_payload_bytes", "gauge", "length of all keys + values in STORE (dict store)")
+
+# storage requests per second handled here (own + forwarded), for GET /load
+STORAGE_RATE = RateCounter()
+
+
+# ----------- route_of : path -> small fixed set of labels (no key names in metric labels)
+def route_of(path):
+    path = urlsplit(path).path
+    for prefix in ("/storage/", "/internal/cache/", "/debug/", "/trace/"):
+        if path.startswith(prefix):
+            return prefix[:-1]
+    if path in ("/helloworld", "/network", "/cache", "/metrics", "/peers", "/load", "/internal/range", "/internal/keys"):
+        return path
+    return "other"
+
+
+# ----------- count_payload : STORE size change when key gets value (None = deleted), for /metrics
+# (the arena knows its own size, this is only for the dict store)
+def count_payload(key, value):
+    delta = 0
+    old = STORE.get(key)
+    if old is not None:
+        delta = delta - len(key) - len(old)
+    if value is not None:
+        delta = delta + len(key) + len(value)
+    if delta != 0:
+        METRICS.inc("chord_store_payload_bytes", (), delta)
+
+
+# ----------- worker_for : private address of the worker that owns key_id (a key of this node),
+# None if it is this process
+def worker_for(key_id):
+    if ARGS.workers <= 1:
+        return None
+    w = workers.slice_of(key_id, CHORD.pred_id, CHORD.self_id, ARGS.workers)
+    if w == ARGS.worker_index:
+        return None
+    return WORKER_ADDRS[w]
+
+
+# ----------- store_put / store_update / store_delete : every STORE write goes here
+# so KEY_INDEX and VERSIONS always match STORE
+# version = None means "new value written here" (take a fresh version)
+# key_id = hash_to_id(key) when the caller has it (saves hashing the key again for KEY_INDEX)
+def store_put(key, value, version=None, key_id=None):
+    if version is None:
+        version = next_version()
+    if ARGS.compact_store:
+        STORE.put(key, value, version)
+        return version
+    count_payload(key, value)
+    STORE[key] = value
+    VERSIONS[key] = version
+    KEY_INDEX.add(key, key_id)
+    return version
+
+def store_update(items):
+    v = next_version()
+    if ARGS.compact_store:
+        for key in items:
+            STORE.put(key, items[key], v)
+        return
+    for key in items:
+        count_payload(key, items[key])
+    STORE.update(items)
+    for key in items:
+        VERSIONS[key] = v
+        KEY_INDEX.add(key)
+
+# ----------- store_missing : store_update for the keys not here yet
+# (restore runs while requests are served: a PUT that came in meanwhile is newer than a pulled copy)
+def store_missing(items):
+    fresh = {}
+    for key in items:
+        if key not in STORE:
+            fresh[key] = items[key]
+    if len(fresh) > 0:
+        store_update(fresh)
+
+def store_delete(key):
+    if not ARGS.compact_store:
+        count_payload(key, None)
+    STORE.pop(key, None)
+    VERSIONS.pop(key, None)
+    KEY_INDEX.remove(key)
+
+# ----------- range_items : (key, value) of every stored key with id in (start, end], one at a time
+# (a generator: values are read while the stream is written, the range is never copied whole)
+def range_items(start_id, end_id):
+    for key in KEY_INDEX.keys_in_range(start_id, end_id):
+        value = STORE.get(key)
+        if value is not None:
+            yield key, value
 
 # stop endless forward loops / bug safety
 DEFAULT_TTL = 32
 
+# header that marks a PUT as a replica copy (store it, do not route it)
+REPLICA_HEADER = "X-Chord-Replica"
+
+# version of a value (owner -> replicas, and on GET replies -> caches)
+VERSION_HEADER = "X-Chord-Version"
+
+# comma list of the nodes a request went through (owner learns who may cache the reply)
+PATH_HEADER = "X-Chord-Path"
+
+# on a GET sent to a replica by the last hop: the owner, asked directly if the copy is not there yet
+OWNER_HEADER = "X-Chord-Owner"
+
+# time left for a request in ms, set by the hop before (every hop works with what the client has left)
+DEADLINE_HEADER = "X-Chord-Deadline-Ms"
+
+# what forwarding learned about each next hop (GET /peers), used for timeouts and to route around failing fingers
+# also limits the forwards in flight per next hop (--peer-limit, --peer-queue)
+PEER_STATS = PeerTable(ARGS.peer_limit, ARGS.peer_queue)
+
+# GETs forwarded right now, by key: a GET for a key that is already on its way shares that reply
+COALESCER = SingleFlight()
+
+# last trace records of this node (GET /trace/<id>)
+TRACES = tracing.TraceBuffer(ARGS.trace_buffer)
+
+# request log (None when --access-log is not given: log_message stays silent either way)
+# with --workers every worker writes its own file (FILE.w0, FILE.w1 ...), rotation is per file
+ACCESS_LOG = None
+if ARGS.access_log != "":
+    log_path = ARGS.access_log
+    if ARGS.workers > 1:
+        log_path = log_path + ".w" + str(ARGS.worker_index)
+    try:
+        ACCESS_LOG = AccessLog(log_path, ARGS.access_log_sample,
+                               int(ARGS.access_log_max_mb * 1024 * 1024), ARGS.access_log_backups)
+    except OSError as e:
+        print("error: cannot open access log: " + str(e))
+        sys.exit(1)
+
+# read cache for keys owned by others (disabled when --cache-size 0)
+CACHE = ReadCache(ARGS.cache_size, ARGS.cache_ttl)
+
+# key -> set of nodes that may hold a cached copy of a value we answered (only with --cache-push)
+# kept by owners, replicas and nodes answering from their cache (invalidations are relayed down the tree)
+SUBSCRIBERS = {}
+SUBSCRIBERS_LOCK = threading.Lock()  # handler threads add readers while a PUT takes the set away
+MAX_SUBSCRIBED_KEYS = 100000
+
+# max queued copies per replica before we start dropping (owner must not block)
+REPL_QUEUE_SIZE = 10000
+
+
+# ----------- Replicator : async copy of owned keys to one successor
+# PUT on the owner only puts (key, value) on a queue and returns
+# a background thread drains the queue and sends the copies
+class Replicator:
+    def __init__(self, target):
+        self.target = target
+        self.queue = queue.Queue(maxsize=REPL_QUEUE_SIZE)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, key, value, version):
+        try:
+            self.queue.put_nowait((key, value, version))
+        except queue.Full:
+            self.dropped = self.dropped + 1
+
+    def _loop(self):
+        while True:
+            key, value, version = self.queue.get()
+            conn = None
+            try:
+                conn = http.client.HTTPConnection(self.target, timeout=5)
+                headers = {}
+                headers["Content-Type"] = "text/plain; charset=utf-8"
+                headers[REPLICA_HEADER] = "1"
+                headers[VERSION_HEADER] = str(version)
+                headers["Connection"] = "close"
+                conn.request("PUT", "/storage/" + key, value.encode("utf-8"), headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status == 200:
+                    self.sent = self.sent + 1
+                else:
+                    self.failed = self.failed + 1
+            except Exception:
+                self.failed = self.failed + 1
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+# one replicator per replica target (empty list if --replicas 0)
+REPLICATORS = []
+for addr in CHORD.replica_addresses():
+    REPLICATORS.append(Replicator(addr))
+
+
+# ----------- Invalidator : async "key changed" messages from the owner to caching nodes
+# same idea as Replicator, one shared queue since targets change per key
+class Invalidator:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=REPL_QUEUE_SIZE)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, target, key, version):
+        try:
+            self.queue.put_nowait((target, key, version))
+        except queue.Full:
+            self.dropped = self.dropped + 1
+
+    def _loop(self):
+        while True:
+            target, key, version = self.queue.get()
+            conn = None
+            try:
+                conn = http.client.HTTPConnection(target, timeout=5)
+                headers = {}
+                headers[VERSION_HEADER] = str(version)
+                headers["Connection"] = "close"
+                conn.request("DELETE", "/internal/cache/" + key, None, headers)
+                resp = conn.getresponse()
+                resp.read()
+                self.sent = self.sent + 1
+            except Exception:
+                self.failed = self.failed + 1
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+INVALIDATOR = None
+if ARGS.cache_push:
+    INVALIDATOR = Invalidator()
+
 
 class DHTHandler(http.server.BaseHTTPRequestHandler):
     server_version = "INF3200"
     sys_version = ""
     protocol_version = "HTTP/1.0"   # no keep alive
 
+    # one send per reply: wfile is a 64KB buffer (default 0 = every header block and body is its own
+    # send), so status line + headers + body leave together at the flush after the body
+    # and TCP_NODELAY so that one send goes out at once (no Nagle wait for an ACK of earlier data)
+    # (http.client on the forwarding side already sets TCP_NODELAY and sends headers + body in one send)
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    # ----------- setup / finish / handle_one_request / send_response : request metrics
+    # the status is caught in send_response (also used by send_error), time is parse -> last write
+    def setup(self):
+        http.server.BaseHTTPRequestHandler.setup(self)
+        METRICS.inc("chord_connections_active", (), 1)
+
+    def finish(self):
+        try:
+            http.server.BaseHTTPRequestHandler.finish(self)
+        finally:
+            METRICS.inc("chord_connections_active", (), -1)
+
+    def handle_one_request(self):
+        self._status = None
+        self._trace = None
+        t0 = time.perf_counter()
+        self._t0 = t0
+        self._t0_wall = time.time_ns()
+        http.server.BaseHTTPRequestHandler.handle_one_request(self)
+        if self._trace is not None:
+            TRACES.add(self._trace.finish(self._status))
+        if self._status is not None:
+            took = time.perf_counter() - t0
+            route = route_of(self.path) if hasattr(self, "path") else "other"
+            method = self.command if self.command is not None else "-"
+            METRICS.inc("chord_requests_total", (("route", route), ("method", method), ("status", str(self._status))))
+            METRICS.observe("chord_request_seconds", (("route", route), ("method", method)), took)
+            if route == "/storage":
+                STORAGE_RATE.hit()
+            if ACCESS_LOG is not None:
+                trace_id = self._trace.trace_id if self._trace is not None else None
+                ACCESS_LOG.log((self._t0_wall / 1e9, self.client_address[0], method,
+                                getattr(self, "path", ""), self._status, int(took * 1e6), trace_id))
+
+    def send_response(self, code, message=None):
+        self._status = code
+        http.server.BaseHTTPRequestHandler.send_response(self, code, message)
+
+    # ----------- _trace_start / _phase : trace this storage request if it has (or gets) a trace id
+    def _trace_start(self):
+        trace_id = tracing.should_trace(self.headers.get(tracing.TRACE_HEADER), ARGS.trace_sample)
+        if trace_id is not None:
+            self._trace = tracing.Trace(trace_id, SELF_ADDR, self.command, self.path, self._t0, self._t0_wall)
+            self._trace.phase("route")
+
+    def _phase(self, name):
+        if self._trace is not None:
+            self._trace.phase(name)
+
+    # ----------- _answered : how a storage request was served (owner / replica / cache / forwarded)
+    def _answered(self, how):
+        METRICS.inc("chord_storage_requests_total", (("method", self.command), ("answered_by", how)))
+
     def _ok_headers(self, content_length: int) -> None:
         
         self.send_response(200)
@@ -69,14 +528,21 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
         self.send_header("Connection", "close")
         self.end_headers()
 
-    def _write_plain(self, status, body):
+    def _write_plain(self, status, body, extra=None):
 
+        self._phase("write")
         self.send_response(status)
         self.send_header("Content-Type", "text/plain; charset=utf-8")
         self.send_header("Content-Length", str(len(body)))
         # no cache
         self.send_header("Cache-Control", "no-store")
         self.send_header("Connection", "close")
+        # extra headers (ex: value version)
+        if extra is not None:
+            for h in extra:
+                self.send_header(h, extra[h])
+        if self._trace is not None:
+            self.send_header(tracing.TRACE_HEADER, self._trace.trace_id)
         self.end_headers()
         # only send body if not HEAD request
         if self.command != "HEAD":
@@ -111,6 +577,18 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
     # if ttl == 0 = give up (error 504)
     # 32 chosen: bigger than log2(N) hops, safe but not too big
 
+    # ----------- _deadline : perf_counter time this request has to be answered by
+    # (--deadline after it arrived, or less if the hop before says less time is left)
+    def _deadline(self):
+        budget = ARGS.deadline
+        value = self.headers.get(DEADLINE_HEADER)
+        if value is not None:
+            try:
+                budget = min(budget, int(value) / 1000.0)
+            except ValueError:
+                pass
+        return self._t0 + budget
+
     def _ttl(self):
         value = self.headers.get("X-Chord-TTL", str(DEFAULT_TTL))
         try:
@@ -118,24 +596,140 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
         except:
             return DEFAULT_TTL
 
+    # ----------- _version_of : int from a version header, None if missing/bad
+    def _version_of(self, text):
+        if text is None:
+            return None
+        try:
+            return int(text)
+        except ValueError:
+            return None
+
+    # ----------- _reply_value : 200 with a stored value and its version
+    def _reply_value(self, key, value):
+        extra = {}
+        if ARGS.compact_store:
+            version = STORE.version(key)
+        else:
+            version = VERSIONS.get(key)
+        if version is not None:
+            extra[VERSION_HEADER] = str(version)
+        self._write_plain(200, value.encode("utf-8"), extra)
+
+    # ----------- _note_readers : remember which nodes on the path may cache the value we answer
+    def _note_readers(self, key):
+        via = self.headers.get(PATH_HEADER)
+        if via is None or INVALIDATOR is None:
+            return
+        with SUBSCRIBERS_LOCK:
+            subs = SUBSCRIBERS.get(key)
+            if subs is None:
+                if len(SUBSCRIBERS) >= MAX_SUBSCRIBED_KEYS:
+                    return  # full: these readers rely on the cache ttl only
+                subs = set()
+                SUBSCRIBERS[key] = subs
+            for addr in via.split(","):
+                if addr != "":
+                    subs.add(addr)
+
+    # ----------- _push_invalidations : send "key changed" to every node noted for this key
+    def _push_invalidations(self, key, version):
+        if INVALIDATOR is None:
+            return
+        with SUBSCRIBERS_LOCK:
+            subs = SUBSCRIBERS.pop(key, None)  # readers noted after this get a new set
+        if subs is not None:
+            for addr in subs:
+                if addr != SELF_ADDR:
+                    INVALIDATOR.submit(addr, key, version)
+
+    # ----------- _forward : send request to next hop and relay the reply
+    # returns (status, version, body) of the upstream reply, or None if it failed
     def _forward(self, method, path, body, next_addr, ttl):
+        reply = self._upstream(method, path, body, next_addr, ttl)
+        return self._relay(reply)
+
+    # ----------- _forward_get : _forward for a GET, but concurrent GETs of the same key here share
+    # one upstream call (single flight); the others are counted as answered_by="coalesced"
+    # how = answered_by of the request that makes the call ("forwarded" or "worker")
+    # extra = more headers for the next hop (ex: X-Chord-Owner)
+    def _forward_get(self, path, next_addr, how, extra=None):
+        if ARGS.no_coalesce:
+            self._answered(how)
+            return self._relay(self._upstream("GET", path, b"", next_addr, self._ttl(), extra))
+
+        # with --cache-push the owner learns the readers from X-Chord-Path: only share with the same path
+        flight_key = path
+        if INVALIDATOR is not None:
+            flight_key = path + "\n" + self.headers.get(PATH_HEADER, "")
+
+        ttl = self._ttl()
+        reply, shared = COALESCER.do(flight_key, lambda: self._upstream("GET", path, b"", next_addr, ttl, extra))
+        if shared:
+            self._answered("coalesced")
+        else:
+            self._answered(how)
+        return self._relay(reply)
+
+    # ----------- _forward_put : _forward for a PUT of a storage key
+    # GET flights of the key that run here started before the write and may bring the old value
+    # back: later GETs must not join them (once before forwarding, once more before the client
+    # gets the reply, for flights that started while the PUT was on its way)
+    def _forward_put(self, path, body, next_addr):
+        COALESCER.forget(path)
+        reply = self._upstream("PUT", path, body, next_addr, self._ttl())
+        COALESCER.forget(path)
+        return self._relay(reply)
+
+    # ----------- _upstream : send request to next hop, wait for its reply
+    # returns (status, content_type, version_text, body); content_type None = the forward failed
+    # (body is the error text), so a reply can be passed to other requests (see _forward_get)
+    def _upstream(self, method, path, body, next_addr, ttl, extra=None):
 
         # stop if ttl is 0
         if ttl <= 0:
-            self._write_plain(504, b"TTL exceeded")
-            return
+            return 504, None, None, b"TTL exceeded"
+
+        # wait for a free slot to this peer, or give up at once (503) if it will not come in time:
+        # a slow peer then costs callers a fast error instead of a thread each until the timeout
+        deadline = self._deadline()
+        if time.perf_counter() >= deadline:
+            return 504, None, None, b"deadline exceeded"
+        t0 = PEER_STATS.begin(next_addr, deadline)
+        if t0 is None:
+            METRICS.inc("chord_forward_rejected_total", (("peer", next_addr),))
+            return 503, None, None, ("next hop " + next_addr + " busy").encode("utf-8")
+        left = max(0.001, deadline - t0)
 
         conn = None #connection varaible
+        answered = False
 
         try:
-            # open connection
-            conn = http.client.HTTPConnection(next_addr, timeout=5)
+            # open connection (timeout from this peer's rtt history, and never past the deadline)
+            conn = http.client.HTTPConnection(next_addr, timeout=min(PEER_STATS.timeout(next_addr), left))
 
             # build headers
             headers = {}
             headers["Content-Type"] = "text/plain; charset=utf-8"
             headers["X-Chord-TTL"] = str(ttl - 1)
+            headers[DEADLINE_HEADER] = str(int(left * 1000))
             headers["Connection"] = "close"
+            if extra is not None:
+                for h in extra:
+                    headers[h] = extra[h]
+
+            # pass the trace on, the next hop records its part under the same id
+            if self._trace is not None:
+                headers[tracing.TRACE_HEADER] = self._trace.trace_id
+                self._trace.next_addr = next_addr
+            self._phase("upstream")
+
+            # add myself to the path (owner can push cache invalidations back)
+            via = self.headers.get(PATH_HEADER)
+            if via is None or via == "":
+                headers[PATH_HEADER] = SELF_ADDR
+            else:
+                headers[PATH_HEADER] = via + "," + SELF_ADDR
 
             # send request
             if method == "PUT":
@@ -156,25 +750,19 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
                     content_type = v
                     break
 
-            # send reply back to client
-            self.send_response(resp.status)
-            self.send_header("Content-Type", content_type)
-            self.send_header("Content-Length", str(len(data)))
-            self.send_header("Connection", "close")
-            self.end_headers()
-
-            # write body if not HEAD
-            if self.command != "HEAD":
-                try:
-                    self.wfile.write(data)
-                    self.wfile.flush()
-                except:
-                    pass
+            version_text = resp.getheader(VERSION_HEADER)
+            METRICS.observe("chord_forward_seconds", (("peer", next_addr),), time.perf_counter() - t0)
+            PEER_STATS.end(next_addr, t0, True)
+            answered = True
+            return resp.status, content_type, version_text, data
 
         except Exception as e: 
             # if failed, send error (502) (stored in var "e")
+            if not answered:
+                PEER_STATS.end(next_addr, t0, False)
+            METRICS.inc("chord_forward_errors_total", (("peer", next_addr),))
             msg = "forward error to " + next_addr + ": " + str(e)
-            self._write_plain(502, msg.encode("utf-8"))
+            return 502, None, None, msg.encode("utf-8")
 
         finally:
             if conn is not None:
@@ -183,6 +771,37 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
                 except:
                     pass
 
+    # ----------- _relay : send an _upstream reply back to the client
+    # returns (status, version, body), or None if the forward failed
+    def _relay(self, reply):
+        status, content_type, version_text, data = reply
+        if content_type is None:
+            self._write_plain(status, data)
+            return None
+
+        self._phase("write")
+
+        # send reply back to client
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Connection", "close")
+        if version_text is not None:
+            self.send_header(VERSION_HEADER, version_text)
+        if self._trace is not None:
+            self.send_header(tracing.TRACE_HEADER, self._trace.trace_id)
+        self.end_headers()
+
+        # write body if not HEAD
+        if self.command != "HEAD":
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except:
+                pass
+
+        return status, self._version_of(version_text), data
+
 
 
     def do_GET(self):
@@ -216,32 +835,318 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
             # cut the key name
             parts = path.split("/storage/", 1)
             key = parts[1]
+            self._trace_start()
 
             # hash key to id
             key_id = hash_to_id(key)
 
             # if i own this key
             if CHORD.is_responsible(key_id) == True:
+                sibling = worker_for(key_id)
+                if sibling is not None:
+                    # another worker of this node has it (not cached: the owner's PUT would not reach here)
+                    self._forward_get(path, sibling, "worker")
+                    return
+                self._answered("owner")
                 if key in STORE:
-                    value = STORE[key]
-                    body = value.encode("utf-8")
-                    self._write_plain(200, body)
+                    self._note_readers(key)
+                    self._reply_value(key, STORE[key])
                 else:
                     self._write_plain(404, b"")
-            else:
-                # forward to next hop
-                next_addr = CHORD.shortcut_step(key_id)
-                self._forward("GET", path, b"", next_addr, self._ttl())
+                return
+
+            if key in STORE:
+                # replica copy: answer here, no need to walk to the owner
+                self._answered("replica")
+                self._note_readers(key)
+                self._reply_value(key, STORE[key])
+                return
+
+            # sent here as a replica but the copy has not arrived: straight to the owner (routing
+            # from here would go the long way round, the owner is behind me)
+            owner = self.headers.get(OWNER_HEADER)
+            if owner is not None and owner in PEERS:
+                self._forward_get(path, owner, "forwarded")
+                return
+
+            # hot key cached on the way back from an earlier GET
+            if CACHE.enabled():
+                hit = CACHE.get(key)
+                if hit is not None:
+                    self._answered("cache")
+                    self._note_readers(key)
+                    extra = {}
+                    extra[VERSION_HEADER] = str(hit[1])
+                    self._write_plain(200, hit[0], extra)
+                    return
+
+            # forward to next hop; the last hop before the owner spreads reads over owner + replicas
+            next_addr = CHORD.shortcut_step(key_id, PEER_STATS.usable)
+            extra = None
+            targets = CHORD.read_targets(key_id)
+            if targets is not None:
+                usable = [a for a in targets if PEER_STATS.usable(a)]
+                if len(usable) > 0:
+                    next_addr = random.choice(usable)
+                if next_addr != CHORD.succ_address:
+                    extra = {OWNER_HEADER: CHORD.succ_address}
+            reply = self._forward_get(path, next_addr, "forwarded", extra)
+
+            # remember the value if the owner (or a replica) gave a version
+            if CACHE.enabled() and reply is not None:
+                status, version, data = reply
+                if status == 200 and version is not None:
+                    CACHE.put(key, data, version)
+            return
+
+        # ---------- /trace/<id>[?depth=N] (records of one trace here and on the next hops)
+        if path.startswith(tracing.TRACE_PATH):
+            self._send_trace(path[len(tracing.TRACE_PATH):], urlsplit(self.path).query)
+            return
+
+        # ---------- /metrics (Prometheus text format)
+        if path == "/metrics":
+            body = METRICS.render(self._gauges()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+                self.wfile.flush()
+            except Exception:
+                pass
+            return
+
+        # ---------- /load (my share of the ring and of the work, for loadreport.py)
+        if path == "/load":
+            self._write_json(self._load())
+            return
+
+        # ---------- /peers (rtt, errors, in flight and timeout per next hop)
+        if path == "/peers":
+            self._write_json(PEER_STATS.snapshot())
+            return
+
+        # ---------- /cache (read cache stats on this node)
+        if path == "/cache":
+            stats = CACHE.stats()
+            if INVALIDATOR is not None:
+                stats["invalidations_sent"] = INVALIDATOR.sent
+                stats["invalidations_failed"] = INVALIDATOR.failed
+                stats["subscribed_keys"] = len(SUBSCRIBERS)
+            self._write_json(stats)
+            return
+
+        # ---------- /internal/range?start=<id>&end=<id> (stream keys with id in (start, end])
+        if path == transfer.RANGE_PATH:
+            self._send_range(urlsplit(self.path).query)
+            return
+
+        # ---------- /internal/keys?start=<id>&end=<id>[&cursor=<id>&limit=<n>] (one page of key names)
+        if path == "/internal/keys":
+            self._send_key_page(urlsplit(self.path).query)
+            return
+
+        # ---------- /debug/profile?seconds=N[&interval_ms=M] and /debug/threads (only with --debug)
+        if path.startswith("/debug/") and ARGS.debug:
+            self._debug(path, urlsplit(self.path).query)
             return
 
         # ---------- other path 
         self.send_error(404, "not found")
 
+    # ----------- _send_trace : my records of a trace + the records of the nodes I forwarded it to
+    # depth limits the recursion like the ttl limits forwards
+    def _send_trace(self, trace_id, query):
+        if not tracing.valid_id(trace_id):
+            self._write_plain(400, b"trace id must be hex")
+            return
+        try:
+            depth = int(parse_qs(query).get("depth", [str(DEFAULT_TTL)])[0])
+        except ValueError:
+            depth = DEFAULT_TTL
+
+        records = TRACES.find(trace_id)
+        if depth > 0:
+            asked = set()
+            for record in list(records):
+                nxt = record["next"]
+                if nxt is not None and nxt not in asked and nxt != SELF_ADDR:
+                    asked.add(nxt)
+                    records.extend(tracing.fetch(nxt, trace_id, depth - 1))
+
+        records.sort(key=lambda r: r["start_ns"])
+        out = {}
+        out["trace"] = trace_id
+        out["hops"] = len(records)
+        out["records"] = records
+        self._write_json(out)
+
+    # ----------- _load : arc (pred_id, self_id], keys, bytes and request rate of this node
+    # ids are sent as strings (160 bit numbers lose digits in most json readers)
+    def _load(self):
+        if CHORD.pred_id == CHORD.self_id:
+            arc = RING_SIZE  # alone: the whole ring
+        else:
+            arc = (CHORD.self_id - CHORD.pred_id) % RING_SIZE
+        arc = arc / ARGS.workers  # --workers: my slice of the node's arc (keys and bytes are mine too)
+        if ARGS.compact_store:
+            payload = len(STORE.data) - STORE.garbage
+        else:
+            payload = METRICS.value("chord_store_payload_bytes")
+        out = {}
+        out["node"] = SELF_ADDR
+        out["self_id"] = str(CHORD.self_id)
+        out["pred_id"] = str(CHORD.pred_id)
+        out["arc_fraction"] = arc / RING_SIZE
+        if ARGS.workers > 1:
+            out["worker"] = ARGS.worker_index
+        out["keys"] = len(STORE)
+        out["owned_keys"] = KEY_INDEX.count_in_range(CHORD.pred_id, CHORD.self_id)
+        out["bytes"] = payload
+        out["requests_per_s"] = STORAGE_RATE.rate(10)
+        return out
+
+    # ----------- _gauges : values read at scrape time (name, help, labels, value)
+    def _gauges(self):
+        out = []
+        out.append(("chord_threads", "python threads alive (one per open connection + background)", (), threading.active_count()))
+        out.append(("chord_store_keys", "keys in STORE (owned + replica copies)", (), len(STORE)))
+        if ARGS.compact_store:
+            out.append(("chord_store_payload_bytes", "bytes of all keys + values in STORE (arena)", (),
+                        len(STORE.data) - STORE.garbage))
+            out.append(("chord_store_memory_bytes", "bytes held by the arena and its index arrays", (), STORE.memory_bytes()))
+        for r in REPLICATORS:
+            out.append(("chord_replication_queue", "replica copies waiting to be sent", (("peer", r.target),), r.queue.qsize()))
+        if CACHE.enabled():
+            out.append(("chord_cache_entries", "values in the read cache", (), len(CACHE.entries)))
+        out.append(("chord_coalesce_forwards", "GET forwards made through the single flight", (), COALESCER.leaders))
+        out.append(("chord_coalesce_shared", "GETs answered with the reply of another GET's forward", (), COALESCER.shared))
+        out.append(("chord_coalesce_in_flight", "keys with a GET forward running right now", (), COALESCER.in_flight()))
+        if ACCESS_LOG is not None:
+            out.append(("chord_access_log_pending", "access log lines waiting for the writer", (), len(ACCESS_LOG.pending)))
+            out.append(("chord_access_log_dropped", "access log lines dropped because the writer was behind", (),
+                        ACCESS_LOG.dropped))
+        return out
+
+    # ----------- _debug : look inside a running node
+    # profile = sampled stacks of all threads in collapsed format (flamegraph.pl / speedscope)
+    # threads = current stack of every thread
+    def _debug(self, path, query):
+        if path == "/debug/threads":
+            self._write_plain(200, profiler.thread_stacks().encode("utf-8"))
+            return
+
+        if path == "/debug/profile":
+            params = parse_qs(query)
+            try:
+                seconds = float(params.get("seconds", ["5"])[0])
+                interval = float(params.get("interval_ms", ["5"])[0]) / 1000.0
+            except ValueError:
+                self._write_plain(400, b"seconds and interval_ms must be numbers")
+                return
+            # float() also takes "nan" and "inf" (time.sleep fails on those)
+            if not (math.isfinite(seconds) and math.isfinite(interval) and seconds > 0 and interval > 0):
+                self._write_plain(400, b"seconds and interval_ms must be finite and more than 0")
+                return
+            text = profiler.profile(seconds, interval)
+            if text is None:
+                self._write_plain(409, b"a profile is already running")
+                return
+            self._write_plain(200, text.encode("utf-8"))
+            return
+
+        self.send_error(404, "not found")
+
+    def _send_range(self, query):
+        params = parse_qs(query)
+        try:
+            start_id = int(params["start"][0])
+            end_id = int(params["end"][0])
+        except Exception:
+            self._write_plain(400, b"need integer start and end")
+            return
+
+        # no Content-Length: stream ends with the END frame and connection close
+        self.send_response(200)
+        self.send_header("Content-Type", transfer.CONTENT_TYPE)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            # keys from the id index (no hashing of every stored key), values read as we go
+            for chunk in transfer.encode_chunks(range_items(start_id, end_id)):
+                self.wfile.write(chunk)  # blocks if the receiver is slow (back pressure)
+            self.wfile.flush()
+        except Exception:
+            return
+
+    # ----------- _drop_range : delete every key with id in (start, end], reply = how many
+    # (a restarting node parked them here on stop and has pulled them back)
+    def _drop_range(self, query):
+        params = parse_qs(query)
+        try:
+            start_id = int(params["start"][0])
+            end_id = int(params["end"][0])
+        except Exception:
+            self._write_plain(400, b"need integer start and end")
+            return
+        # (x, x] means the whole ring: only a node alone in the ring ever hands that over
+        if start_id == end_id and CHORD.succ_address != SELF_ADDR:
+            self._write_plain(400, b"start == end would delete everything")
+            return
+        count = 0
+        for key in KEY_INDEX.keys_in_range(start_id, end_id):
+            store_delete(key)
+            count = count + 1
+        self._write_plain(200, str(count).encode("utf-8"))
+
+    def _send_key_page(self, query):
+        params = parse_qs(query)
+        try:
+            start_id = int(params.get("start", ["0"])[0])
+            end_id = int(params.get("end", ["0"])[0])
+            cursor = None
+            if "cursor" in params:
+                cursor = int(params["cursor"][0])
+            limit = int(params.get("limit", ["1000"])[0])
+        except Exception:
+            self._write_plain(400, b"start, end, cursor and limit must be integers")
+            return
+
+        entries, next_cursor = KEY_INDEX.page(start_id, end_id, cursor, max(1, limit))
+        keys = []
+        for entry in entries:
+            keys.append(entry[1])
+
+        # cursor is a 160 bit id: send it as a string so json readers keep every digit
+        out = {}
+        out["keys"] = keys
+        if next_cursor is None:
+            out["next"] = None
+        else:
+            out["next"] = str(next_cursor)
+        self._write_json(out)
+
+    def _receive_range(self):
+        try:
+            count = transfer.ingest(self.rfile, store_update)
+        except Exception as e:
+            self._write_plain(400, ("bad frame stream: " + str(e)).encode("utf-8"))
+            return
+        self._write_plain(200, str(count).encode("utf-8"))
+
 
     def do_PUT(self):
         # clean path
         path = urlsplit(self.path).path
 
+        # bulk ingest of a framed key range (handoff from another node)
+        if path == transfer.RANGE_PATH:
+            self._receive_range()
+            return
+
         # only allow storage
         if not path.startswith("/storage/"):
             self.send_error(404, "not found")
@@ -250,9 +1155,11 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
         # cut key name
         parts = path.split("/storage/", 1)
         key = parts[1]
+        self._trace_start()
 
         # hash to id
         key_id = hash_to_id(key)
+        self._phase("body")
 
         # read content length
         length_str = self.headers.get("Content-Length", "0")
@@ -266,20 +1173,86 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
         if length > 0:
             body = self.rfile.read(length)
 
+        self._phase("route")
+
+        # replica copy pushed by the owner: store it as is
+        if self.headers.get(REPLICA_HEADER) is not None:
+            self._phase("store")
+            version = self._version_of(self.headers.get(VERSION_HEADER))
+            store_put(key, body.decode("utf-8", errors="replace"), version, key_id)
+            COALESCER.forget(path)
+            self._answered("replica_copy")
+            self._write_plain(200, b"")
+            return
+
         # if i own this key
-        if CHORD.is_responsible(key_id) == True:
+        if CHORD.is_responsible(key_id) == True and worker_for(key_id) is not None:
+            # another worker of this node owns it
+            self._answered("worker")
+            self._forward_put(path, body, worker_for(key_id))
+
+        elif CHORD.is_responsible(key_id) == True:
+            self._answered("owner")
+            self._phase("store")
             try:
-                STORE[key] = body.decode("utf-8")
+                version = store_put(key, body.decode("utf-8"), None, key_id)
 
             except Exception:
 
-                STORE[key] = body.decode("utf-8", errors="replace")
-            self._write_plain(200, b"")
+                version = store_put(key, body.decode("utf-8", errors="replace"), None, key_id)
+            COALESCER.forget(path)
+            # the version goes back along the path, so forwarding nodes can cache the new value
+            extra = {}
+            extra[VERSION_HEADER] = str(version)
+            self._write_plain(200, b"", extra)
+
+            # queue copies for the successors (async, client does not wait)
+            for r in REPLICATORS:
+                r.submit(key, STORE[key], version)
+
+            # tell nodes that cached the old value to drop it
+            self._push_invalidations(key, version)
 
         else:
             # forward to next hop
-            next_addr = CHORD.shortcut_step(key_id)
-            self._forward("PUT", path, body, next_addr, self._ttl())
+            # my cached copy is old after this PUT: drop it now, the owner's push comes after the
+            # reply (the client would read its old value back from here)
+            self._answered("forwarded")
+            if CACHE.enabled():
+                CACHE.drop(key)
+            next_addr = CHORD.shortcut_step(key_id, PEER_STATS.usable)
+            reply = self._forward_put(path, body, next_addr)
+
+            # the owner sends the new version back: cache the value just written
+            if CACHE.enabled() and reply is not None:
+                status, version, _ = reply
+                if status == 200 and version is not None:
+                    CACHE.put(key, body, version)
+
+    def do_DELETE(self):
+        # clean path
+        path = urlsplit(self.path).path
+
+        # ---------- /internal/cache/<key> (owner says the value changed)
+        if path.startswith("/internal/cache/"):
+            key = path.split("/internal/cache/", 1)[1]
+            version = self._version_of(self.headers.get(VERSION_HEADER))
+            if version is None:
+                self._write_plain(400, b"missing version")
+                return
+            CACHE.invalidate(key, version)
+            self._write_plain(200, b"")
+
+            # pass it on to nodes that got the value from my cache
+            self._push_invalidations(key, version)
+            return
+
+        # ---------- /internal/range?start=<id>&end=<id> (delete keys with id in (start, end])
+        if path == transfer.RANGE_PATH:
+            self._drop_range(urlsplit(self.path).query)
+            return
+
+        self.send_error(404, "not found")
 
     def do_HEAD(self):
         # clean path
@@ -301,22 +1274,139 @@ class DHTHandler(http.server.BaseHTTPRequestHandler):
         return
 
 
+# ----------- restore : on start, get back the keys the last stop saved
+# --state-dir with a saved file: load it (it has my keys and my replica copies). else pull them
+# from the other nodes (restore_from_peers), in the background: nodes that start together would
+# otherwise wait on each other (a node only answers once its own restore is done)
+def restore():
+    if STATE_FILE is not None and os.path.exists(STATE_FILE):
+        try:
+            count = transfer.load_file(STATE_FILE, store_update)
+        except (OSError, ValueError) as e:
+            print("[restore] cannot load " + STATE_FILE + ": " + str(e))
+            return
+        os.replace(STATE_FILE, STATE_FILE + ".old")  # a crash restart later must not load it again
+        print("[restore] " + str(count) + " keys from " + STATE_FILE)
+        return
+    if ARGS.workers > 1 or CHORD.succ_address == SELF_ADDR:
+        return
+    threading.Thread(target=restore_from_peers, name="restore", daemon=True).start()
+
+# ----------- restore_from_peers : my range and the replica copies i keep, from the nodes that have them
+def restore_from_peers():
+    # my range: parked at the successor by drain, or after a crash still on my replicas
+    # (the successor first, then the replicas, until one has keys)
+    sources = [CHORD.succ_address]
+    for addr in CHORD.replica_addresses():
+        if addr not in sources:
+            sources.append(addr)
+    for addr in sources:
+        try:
+            count = transfer.pull_range(addr, CHORD.pred_id, CHORD.self_id, store_missing, 5)
+        except Exception:
+            continue  # not up yet (cluster start)
+        if count == 0:
+            continue
+        print("[restore] " + str(count) + " keys from " + addr)
+
+        # all keys are here now: the successor can delete its parked copy (not if it is one of my
+        # replicas, then it keeps them as a replica)
+        if addr not in CHORD.replica_addresses():
+            try:
+                transfer.drop_range(addr, CHORD.pred_id, CHORD.self_id, 5)
+            except Exception as e:
+                print("[restore] " + addr + " keeps its copy: " + str(e))
+        break
+
+    # copies i keep for other nodes (drain only hands off my own range): ask their owners again
+    for owner, start_id, end_id in CHORD.replica_of:
+        try:
+            count = transfer.pull_range(owner, start_id, end_id, store_missing, 5)
+        except Exception as e:
+            print("[restore] no replica copies from " + owner + " (" + str(e) + ")")
+            continue
+        if count > 0:
+            print("[restore] " + str(count) + " replica copies from " + owner)
+
+
+# ----------- drain : on stop, after the listener is closed (new connections are refused)
+# wait up to timeout for running requests and queued replica copies, then save the keys:
+# --state-dir: everything in STORE to the file; else my range to the successor (restore gets it back,
+# and pulls the replica copies i keep for others from their owners)
+def drain(timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        busy = METRICS.value("chord_connections_active")
+        for r in REPLICATORS:
+            busy = busy + r.queue.qsize()
+        if busy == 0:
+            break
+        time.sleep(0.05)
+    left = METRICS.value("chord_connections_active")
+    if left > 0:
+        print("[drain] " + str(left) + " requests still running after " + str(timeout) + "s")
+
+    if STATE_FILE is not None:
+        items = list(STORE.items())
+        try:
+            transfer.save_file(STATE_FILE, items)
+            print("[drain] saved " + str(len(items)) + " keys to " + STATE_FILE)
+        except OSError as e:
+            print("[drain] cannot save to " + STATE_FILE + ": " + str(e))
+        return
+
+    if len(STORE) == 0:
+        return
+    if ARGS.workers > 1 or CHORD.succ_address == SELF_ADDR:
+        print("[drain] " + str(len(STORE)) + " keys lost (use --state-dir)")
+        return
+    items = []
+    for key in KEY_INDEX.keys_in_range(CHORD.pred_id, CHORD.self_id):
+        value = STORE.get(key)
+        if value is not None:
+            items.append((key, value))
+    try:
+        count = transfer.push_items(CHORD.succ_address, items)
+        print("[drain] handed " + str(count) + " keys to " + CHORD.succ_address)
+    except Exception as e:
+        print("[drain] handoff to " + CHORD.succ_address + " failed, " + str(len(items)) + " keys lost: " + str(e))
+
+
 class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
     daemon_threads = True          # kill threads when server closes
     allow_reuse_address = True     # faster restart
+    request_queue_size = 128       # listen backlog (default 5: a burst of new connections gets SYN retries)
+
+
+# ----------- SharedPortHTTPServer : --workers, all workers bind the node port (SO_REUSEPORT),
+# the kernel hands every new connection to one of them
+class SharedPortHTTPServer(ThreadingHTTPServer):
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        ThreadingHTTPServer.server_bind(self)
 
 
 def main():
     # try to start threaded server
+    # (--workers: the shared node port + this worker's private port for requests from the other workers)
+    private = None
     try:
-        httpd = ThreadingHTTPServer(("", PORT), DHTHandler)
+        if ARGS.workers > 1:
+            httpd = SharedPortHTTPServer(("", PORT), DHTHandler)
+            host, port = WORKER_ADDRS[ARGS.worker_index].rsplit(":", 1)
+            private = ThreadingHTTPServer((host, int(port)), DHTHandler)
+            threading.Thread(target=private.serve_forever, daemon=True).start()
+        else:
+            httpd = ThreadingHTTPServer(("", PORT), DHTHandler)
     except OSError as e:
         print("[ERROR] cant start server on", PORT, ":", e)
         sys.exit(1)
 
     # ----------- clean shutdown 
+    # shutdown() waits until serve_forever returns, and serve_forever runs in this (main) thread:
+    # called right here it would wait forever, so it runs in its own thread
     def _stop(_signum, _frame):
-        httpd.shutdown()
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
 
     # stop on kill (TERM)
     signal.signal(signal.SIGTERM, _stop)
@@ -328,14 +1418,23 @@ def main():
     timer = threading.Timer(900, httpd.shutdown)
     timer.start()
 
+    # keys from the last stop (file: before the first request is served, peers: in the background)
+    restore()
+
     # ----------- main loop 
     try:
         httpd.serve_forever()
 
     finally:
-        # always cleanup
+        # always cleanup: close the listener first, then finish requests and save the keys
         timer.cancel()
         httpd.server_close()
+        if private is not None:
+            private.shutdown()
+            private.server_close()
+        drain(ARGS.drain_timeout)
+        if ACCESS_LOG is not None:
+            ACCESS_LOG.close()  # write the lines still waiting
 
 
 if __name__ == "__main__":
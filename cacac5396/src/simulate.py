@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# simulate.py
+# offline routing simulator: one python process, no network, thousands to millions of ChordNode
+# a lookup starts on a random node and follows the same steps as server.py
+# (is_responsible -> done, else go to shortcut_step) until the owner is reached
+# reports hop count distribution, forwarding load per node and routing table size
+#
+# nodes are built lazily with ChordNode.from_ring (bisect, no per node hashing), only the nodes a
+# lookup passes through exist, so a 1M ring costs about one sha1 per address plus the visited nodes
+
+import sys
+import json
+import time
+import random
+import argparse
+
+import chord
+from chord import ChordNode
+from histogram import Histogram
+
+DEFAULT_SIZES = "16,100,1000,10000"
+
+# finger policies: which 2^i fingers a node keeps for a ring of n nodes
+#   repo : what server.py does today, i = 0 .. how_many_fingers(n)-1
+#   top  : same table size, but the top exponents (classic chord spacing, fingers cover the whole ring)
+#   full : all M_BITS exponents (textbook chord)
+#   succ : no fingers, successor only (worst case baseline)
+POLICIES = ("repo", "top", "full", "succ")
+
+
+def exponents_for(policy, n):
+    k = chord.how_many_fingers(n)
+    if policy == "repo":
+        return list(range(k))
+    if policy == "top":
+        return list(range(chord.M_BITS - k, chord.M_BITS))
+    if policy == "full":
+        return list(range(chord.M_BITS))
+    if policy == "succ":
+        return []
+    raise ValueError("unknown policy: " + policy)
+
+
+# ----------- synthetic_addresses : n fake "host:port" addresses, 100 nodes per host
+def synthetic_addresses(n):
+    out = []
+    for i in range(n):
+        out.append("c" + str(i // 100) + "-" + str(i % 100) + ":" + str(50000 + i % 10000))
+    return out
+
+
+class Ring:
+    def __init__(self, n, policy):
+        self.ring, self.ids = chord.sorted_ring(synthetic_addresses(n))
+        self.exponents = exponents_for(policy, n)
+        self.index_of = {}
+        for i in range(len(self.ring)):
+            self.index_of[self.ring[i][0]] = i
+        self.nodes = {}  # index -> ChordNode, built on first visit
+
+    def node(self, i):
+        n = self.nodes.get(i)
+        if n is None:
+            n = ChordNode.from_ring(self.ring, self.ids, i, self.exponents)
+            self.nodes[i] = n
+        return n
+
+
+# ----------- simulate : run lookups on one ring, return the result dict
+def simulate(n, policy, lookups, max_hops, rng):
+    t0 = time.perf_counter()
+    r = Ring(n, policy)
+    built = time.perf_counter() - t0
+
+    hops_hist = Histogram()
+    hop_counts = {}           # exact distribution: hops -> lookups
+    forwards = {}             # node index -> lookups it forwarded
+    truncated = 0
+
+    t1 = time.perf_counter()
+    for _ in range(lookups):
+        key_id = rng.getrandbits(chord.M_BITS)
+        i = rng.randrange(n)
+        hops = 0
+        while True:
+            node = r.node(i)
+            if node.is_responsible(key_id):
+                break
+            if hops >= max_hops:
+                truncated = truncated + 1
+                break
+            forwards[i] = forwards.get(i, 0) + 1
+            i = r.index_of[node.shortcut_step(key_id)]
+            hops = hops + 1
+        hops_hist.record(hops)
+        hop_counts[hops] = hop_counts.get(hops, 0) + 1
+    routed = time.perf_counter() - t1
+
+    # routing table size = distinct nodes in pred/succ/fingers (what /network shows)
+    table_total = 0
+    table_max = 0
+    for node in r.nodes.values():
+        size = len(node.network_view())
+        table_total = table_total + size
+        if size > table_max:
+            table_max = size
+
+    total_forwards = 0
+    max_forwards = 0
+    for c in forwards.values():
+        total_forwards = total_forwards + c
+        if c > max_forwards:
+            max_forwards = c
+    mean_forwards = total_forwards / n  # over all nodes, also the ones that never forwarded
+
+    out = {}
+    out["nodes"] = n
+    out["policy"] = policy
+    out["fingers"] = len(r.exponents)
+    out["lookups"] = lookups
+    out["hops"] = hops_hist.summary()
+    out["hop_counts"] = [[h, hop_counts[h]] for h in sorted(hop_counts)]
+    out["truncated"] = truncated
+    out["forward_mean"] = mean_forwards
+    out["forward_max"] = max_forwards
+    out["forward_max_over_mean"] = (max_forwards / mean_forwards) if mean_forwards > 0 else 0.0
+    out["nodes_built"] = len(r.nodes)
+    out["table_mean"] = table_total / len(r.nodes) if len(r.nodes) > 0 else 0.0
+    out["table_max"] = table_max
+    out["ring_build_s"] = built
+    out["route_s"] = routed
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="offline chord routing simulator")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="ring sizes, comma separated (default " + DEFAULT_SIZES + ")")
+    ap.add_argument("--policy", default="repo,top", help="finger policies, comma separated: " + ", ".join(POLICIES))
+    ap.add_argument("--lookups", type=int, default=10000, help="lookups per ring (default 10000)")
+    ap.add_argument("--max-hops", type=int, default=10000, help="stop a lookup after this many hops (counted as truncated)")
+    ap.add_argument("--seed", type=int, default=1, help="random seed (keys and start nodes)")
+    ap.add_argument("--json", default="", help="write full results (with exact hop distributions) to this file")
+    args = ap.parse_args()
+
+    sizes = []
+    for part in args.sizes.split(","):
+        if part.strip() != "":
+            sizes.append(int(part))
+    policies = []
+    for part in args.policy.split(","):
+        if part.strip() != "":
+            if part.strip() not in POLICIES:
+                print("[error] unknown policy " + part + ", use: " + ", ".join(POLICIES))
+                sys.exit(1)
+            policies.append(part.strip())
+    if len(sizes) == 0 or min(sizes) < 1 or args.lookups < 1:
+        print("[error] need ring sizes >= 1 and --lookups >= 1")
+        sys.exit(1)
+
+    results = []
+    print("nodes,policy,fingers,lookups,hops_mean,hops_p50,hops_p99,hops_max,truncated," +
+          "fwd_max_over_mean,table_mean,table_max,nodes_built,seconds")
+    for n in sizes:
+        for policy in policies:
+            rng = random.Random(args.seed)  # same keys and start nodes for every policy
+            r = simulate(n, policy, args.lookups, args.max_hops, rng)
+            results.append(r)
+            h = r["hops"]
+            print(str(n) + "," + policy + "," + str(r["fingers"]) + "," + str(r["lookups"]) + "," +
+                  format(h["mean"], ".2f") + "," + str(h["p50"]) + "," + str(h["p99"]) + "," + str(h["max"]) + "," +
+                  str(r["truncated"]) + "," + format(r["forward_max_over_mean"], ".1f") + "," +
+                  format(r["table_mean"], ".1f") + "," + str(r["table_max"]) + "," + str(r["nodes_built"]) + "," +
+                  format(r["ring_build_s"] + r["route_s"], ".1f"))
+            sys.stdout.flush()
+
+    if args.json != "":
+        f = open(args.json, "w", encoding="utf-8")
+        json.dump({"seed": args.seed, "max_hops": args.max_hops, "results": results}, f, indent=1)
+        f.write("\n")
+        f.close()
+        print("[info] results written to " + args.json)
+
+
+if __name__ == "__main__":
+    main()
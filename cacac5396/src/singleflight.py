@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# ------ singleflight.py
+# one upstream call for many identical requests that arrive at the same time
+# the first request for a key (the leader) runs the call, requests for the same key that come
+# while it runs wait for it and all get the leader's result; the next request after that starts
+# a new call (nothing is kept after the call, this is not a cache)
+# a call that started before a write can return the old value: the writer calls forget(key) so the
+# requests that come after the write start a new call instead of joining the old one
+
+import threading
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}   # key -> Call running now
+        self.leaders = 0  # calls made
+        self.shared = 0   # requests that got the result of another request's call
+
+    # ----------- do : (result of fn(), shared) ; shared = True if another request made the call
+    # fn must not raise (the waiters would get None): return the error as a result instead
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = Call()
+                self.calls[key] = call
+                self.leaders = self.leaders + 1
+                leader = True
+            else:
+                call.waiters = call.waiters + 1
+                self.shared = self.shared + 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            return call.result, True
+
+        try:
+            call.result = fn()
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:  # not if forget() took it out already
+                    del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+    # ----------- forget : later requests for key (and for key + "\n" + anything, callers that add
+    # a variant to the key) do not join the calls running now; their waiters still get the result
+    def forget(self, key):
+        with self.lock:
+            if len(self.calls) == 0:
+                return
+            prefix = key + "\n"
+            for k in list(self.calls):
+                if k == key or k.startswith(prefix):
+                    del self.calls[k]
+
+    def in_flight(self):
+        return len(self.calls)
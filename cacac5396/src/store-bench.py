@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# store-bench.py
+# memory per key and put/get speed: plain dict STORE vs ArenaStore
+# (no network, only the local storage structure)
+
+import sys
+import time
+import random
+import string
+import argparse
+import tracemalloc
+
+from arena import ArenaStore
+
+
+def make_values(n, size):
+    # one random pool, every value is its own slice (a server decodes a new str for every PUT)
+    letters = string.ascii_letters + string.digits
+    pool = "".join(random.choices(letters, k=size + 1024))
+    values = []
+    for i in range(n):
+        start = i % 1024
+        values.append(pool[start:start + size])
+    return values
+
+
+def measure(kind, keys, values):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+
+    if kind == "dict":
+        store = {}
+    else:
+        store = ArenaStore()
+
+    # keys and values are re-created (like decoding an HTTP request) so the store owns them
+    t0 = time.perf_counter()
+    for i in range(len(keys)):
+        store[(keys[i] + ".")[:-1]] = (values[i] + ".")[:-1]
+    t1 = time.perf_counter()
+
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    t2 = time.perf_counter()
+    for i in range(len(keys)):
+        store.get(keys[i])
+    t3 = time.perf_counter()
+
+    out = {}
+    out["kind"] = kind
+    out["keys"] = len(keys)
+    out["bytes"] = used
+    out["bytes_per_key"] = used / len(keys)
+    out["put_ops_s"] = len(keys) / (t1 - t0)
+    out["get_ops_s"] = len(keys) / (t3 - t2)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keys", type=int, default=1000000, help="number of keys (default 1M)")
+    ap.add_argument("--value-size", type=int, default=100, help="bytes per value (default 100, like bench.py)")
+    args = ap.parse_args()
+
+    # same key shape as bench.py
+    keys = []
+    for i in range(args.keys):
+        keys.append("k0_" + str(i))
+    values = make_values(args.keys, args.value_size)
+
+    payload = 0
+    for i in range(len(keys)):
+        payload = payload + len(keys[i]) + len(values[i])
+    print("[info] keys: " + str(args.keys) + ", value_size: " + str(args.value_size) +
+          ", payload per key: " + format(payload / len(keys), ".1f") + " bytes")
+
+    print("kind,keys,bytes,bytes_per_key,put_ops_s,get_ops_s")
+    results = []
+    for kind in ("dict", "arena"):
+        r = measure(kind, keys, values)
+        results.append(r)
+        print(r["kind"] + "," + str(r["keys"]) + "," + str(r["bytes"]) + "," +
+              format(r["bytes_per_key"], ".1f") + "," + format(r["put_ops_s"], ".0f") + "," +
+              format(r["get_ops_s"], ".0f"))
+        sys.stdout.flush()
+
+    saved = 1.0 - results[1]["bytes"] / results[0]["bytes"]
+    print("[done] arena uses " + format(saved * 100, ".1f") + "% less memory than dict")
+
+
+if __name__ == "__main__":
+    main()
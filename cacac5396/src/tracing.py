@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# ------ tracing.py
+# follow one request over the chord hops
+# the entry node gives a request a trace id (or keeps the one the client sent), _forward passes it
+# on in X-Chord-Trace, and every node keeps one record per traced request in a ring buffer:
+#   phases: parse (request line + headers), route (hash + who owns it), body (read PUT body),
+#           upstream (waiting for the next hop), write (sending the reply)
+# GET /trace/<id> on any node returns its records plus the ones of the next hops (asked recursively)
+
+import os
+import json
+import time
+import random
+import http.client
+from collections import deque
+
+TRACE_HEADER = "X-Chord-Trace"
+TRACE_PATH = "/trace/"
+
+
+def new_trace_id():
+    return os.urandom(8).hex()
+
+
+# ----------- valid_id : only short hex ids (the id goes in urls and headers)
+def valid_id(text):
+    if text is None or len(text) == 0 or len(text) > 32:
+        return False
+    for c in text:
+        if c not in "0123456789abcdef":
+            return False
+    return True
+
+
+# ----------- Trace : phases of one request on this node
+# phase(name) ends the running phase and starts the next one, so phases never overlap or leave gaps
+class Trace:
+    def __init__(self, trace_id, node, method, path, t0, wall_ns):
+        self.trace_id = trace_id
+        self.node = node
+        self.method = method
+        self.path = path
+        self.t0 = t0              # perf_counter at the start of the request (phase offsets)
+        self.wall_ns = wall_ns    # wall clock at the start (order records of different nodes)
+        self.phases = []          # (name, start_us, duration_us)
+        self.current = "parse"    # a trace starts when the headers are read: that part was parsing
+        self.current_start = t0
+        self.next_addr = None
+
+    def phase(self, name):
+        now = time.perf_counter()
+        if self.current is not None:
+            self.phases.append((self.current, int((self.current_start - self.t0) * 1e6),
+                                int((now - self.current_start) * 1e6)))
+        self.current = name
+        self.current_start = now
+
+    def finish(self, status):
+        self.phase(None)
+        record = {}
+        record["trace"] = self.trace_id
+        record["node"] = self.node
+        record["method"] = self.method
+        record["path"] = self.path
+        record["status"] = status
+        record["start_ns"] = self.wall_ns
+        total = 0
+        if len(self.phases) > 0:
+            last = self.phases[-1]
+            total = last[1] + last[2]
+        record["total_us"] = total
+        record["phases"] = [{"name": n, "start_us": s, "us": d} for n, s, d in self.phases]
+        record["next"] = self.next_addr
+        return record
+
+
+# ----------- TraceBuffer : last size records (deque append is thread safe, old records fall out)
+class TraceBuffer:
+    def __init__(self, size):
+        self.records = deque(maxlen=size)
+
+    def add(self, record):
+        self.records.append(record)
+
+    def find(self, trace_id):
+        out = []
+        for record in list(self.records):
+            if record["trace"] == trace_id:
+                out.append(record)
+        return out
+
+
+# ----------- should_trace : id for a request (header from a client or an earlier hop), a new id
+# for sample_rate of the untraced requests, else None
+def should_trace(header_value, sample_rate):
+    if header_value is not None:
+        if valid_id(header_value):
+            return header_value
+        return None
+    if sample_rate > 0 and random.random() < sample_rate:
+        return new_trace_id()
+    return None
+
+
+# ----------- fetch : records of a trace from another node (and its next hops), [] if it fails
+def fetch(address, trace_id, depth, timeout=2):
+    conn = None
+    try:
+        conn = http.client.HTTPConnection(address, timeout=timeout)
+        conn.request("GET", TRACE_PATH + trace_id + "?depth=" + str(depth), None, {"Connection": "close"})
+        resp = conn.getresponse()
+        data = resp.read()
+        if resp.status != 200:
+            return []
+        return json.loads(data.decode("utf-8"))["records"]
+    except Exception:
+        return []
+    finally:
+        if conn is not None:
+            conn.close()
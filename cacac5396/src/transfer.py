@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# ------ transfer.py
+# stream many key/values between nodes in one connection (range handoff)
+# instead of one HTTP PUT per key
+
+import os
+import struct
+import socket
+import http.client
+
+# frame = [key_len 4 bytes][value_len 4 bytes][key bytes][value bytes]
+# big endian unsigned ints, so a frame header is always 8 bytes
+FRAME_HEADER = struct.Struct(">II")
+
+# last frame: key_len = END_MARK and value_len = number of frames sent
+# lets the receiver tell a finished stream from a cut connection
+END_MARK = 0xFFFFFFFF
+
+# frames are packed into chunks of about this size before one socket write
+# blocking writes of whole chunks = back pressure (sender waits for a slow receiver)
+CHUNK_SIZE = 64 * 1024
+
+RANGE_PATH = "/internal/range"
+CONTENT_TYPE = "application/x-chord-frames"
+
+
+# ----------- encode_chunks : turn (key, value) strings into framed byte chunks
+def encode_chunks(items):
+    buf = bytearray()
+    count = 0
+    for key, value in items:
+        k = key.encode("utf-8")
+        v = value.encode("utf-8")
+        buf += FRAME_HEADER.pack(len(k), len(v))
+        buf += k
+        buf += v
+        count = count + 1
+        if len(buf) >= CHUNK_SIZE:
+            yield bytes(buf)
+            buf = bytearray()
+
+    buf += FRAME_HEADER.pack(END_MARK, count)
+    yield bytes(buf)
+
+
+# ----------- _read_exact : read n bytes or fail (short read = broken stream)
+def _read_exact(fileobj, n):
+    data = fileobj.read(n)
+    if data is None or len(data) != n:
+        raise ValueError("truncated frame stream")
+    return data
+
+
+# ----------- iter_frames : read (key, value) strings back from a framed stream
+def iter_frames(fileobj):
+    count = 0
+    while True:
+        head = _read_exact(fileobj, FRAME_HEADER.size)
+        k_len, v_len = FRAME_HEADER.unpack(head)
+
+        if k_len == END_MARK:
+            if v_len != count:
+                raise ValueError("frame count mismatch: got " + str(count) + " expected " + str(v_len))
+            return
+
+        key = _read_exact(fileobj, k_len).decode("utf-8", errors="replace")
+        value = _read_exact(fileobj, v_len).decode("utf-8", errors="replace")
+        count = count + 1
+        yield key, value
+
+
+# ----------- ingest : bulk insert a framed stream
+# update = function taking a dict of key/values (ex: store.update)
+# insert in batches (one call per batch instead of per key)
+def ingest(fileobj, update, batch_size=1024):
+    total = 0
+    batch = {}
+    for key, value in iter_frames(fileobj):
+        batch[key] = value
+        if len(batch) >= batch_size:
+            update(batch)
+            total = total + len(batch)
+            batch = {}
+
+    if len(batch) > 0:
+        update(batch)
+        total = total + len(batch)
+    return total
+
+
+# ----------- pull_range : ask a node for every key with id in (start, end] and store it
+def pull_range(address, start_id, end_id, update, timeout=30):
+    conn = http.client.HTTPConnection(address, timeout=timeout)
+    try:
+        path = RANGE_PATH + "?start=" + str(start_id) + "&end=" + str(end_id)
+        conn.request("GET", path, headers={"Connection": "close"})
+        resp = conn.getresponse()
+        if resp.status != 200:
+            resp.read()
+            raise RuntimeError("range pull from " + address + " failed: " + str(resp.status))
+        return ingest(resp, update)
+    finally:
+        conn.close()
+
+
+# ----------- drop_range : a node deletes every key with id in (start, end], returns how many
+# (keys that were only parked there, see server.py restore: call it after pull_range worked)
+def drop_range(address, start_id, end_id, timeout=30):
+    conn = http.client.HTTPConnection(address, timeout=timeout)
+    try:
+        path = RANGE_PATH + "?start=" + str(start_id) + "&end=" + str(end_id)
+        conn.request("DELETE", path, headers={"Connection": "close"})
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            raise RuntimeError("range drop on " + address + " failed: " + str(resp.status))
+        return int(body.decode("utf-8") or "0")
+    finally:
+        conn.close()
+
+
+# ----------- push_items : stream (key, value) pairs to a node that bulk ingests them
+# body has no Content-Length: we half close the socket when done so the server sees EOF
+def push_items(address, items, timeout=30):
+    conn = http.client.HTTPConnection(address, timeout=timeout)
+    try:
+        conn.putrequest("PUT", RANGE_PATH)
+        conn.putheader("Content-Type", CONTENT_TYPE)
+        conn.putheader("Connection", "close")
+        conn.endheaders()
+
+        for chunk in encode_chunks(items):
+            conn.send(chunk)
+        conn.sock.shutdown(socket.SHUT_WR)
+
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            raise RuntimeError("range push to " + address + " failed: " + str(resp.status))
+        return int(body.decode("utf-8") or "0")
+    finally:
+        conn.close()
+
+
+# ----------- save_file : the same frames into a file (keys kept over a restart)
+# written to path.tmp and renamed: a crash while saving leaves the old file, never half of one
+def save_file(path, items):
+    tmp = path + ".tmp"
+    f = open(tmp, "wb")
+    try:
+        for chunk in encode_chunks(items):
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+    os.replace(tmp, path)
+
+
+# ----------- load_file : bulk insert a file written by save_file
+def load_file(path, update):
+    f = open(path, "rb")
+    try:
+        return ingest(f, update)
+    finally:
+        f.close()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# ------ workers.py
+# server.py --workers W: one node = W worker processes (one python process only uses ~1 core, GIL)
+# all workers listen on the node port together (SO_REUSEPORT: the kernel spreads new connections),
+# and every worker also has a private port on 127.0.0.1
+# the ring does not change (still one id per node, same peers.json): the node's arc (pred_id, self_id]
+# is cut into W equal slices, worker w owns slice w and keeps those keys in its own STORE
+# (no store shared between processes, no locks between them). a request for a key of the node
+# that lands on the wrong worker goes one local hop to the owner's private port
+# the first process only supervises: it starts the workers and restarts the ones that crash
+
+import os
+import sys
+import time
+import signal
+import socket
+import subprocess
+
+from chord import RING_SIZE
+
+CHECK_INTERVAL = 0.2    # seconds between looks at the workers
+RESTART_DELAY = 0.5     # wait before the first restart, doubled while a worker keeps crashing
+MAX_RESTART_DELAY = 10.0
+STABLE_AFTER = 10.0     # a worker that ran this long gets the short delay again
+MAX_QUICK_FAILS = 5     # a worker that crashed this often in a row before STABLE_AFTER: give up
+
+
+# ----------- slice_of : which of count workers owns key_id (key_id must be in (pred_id, self_id])
+# offset 0 is the first id after pred_id; slice w = offsets [arc*w/count, arc*(w+1)/count)
+def slice_of(key_id, pred_id, self_id, count):
+    arc = (self_id - pred_id) % RING_SIZE
+    if arc == 0:
+        arc = RING_SIZE  # alone in the ring: the whole ring
+    offset = (key_id - pred_id - 1) % RING_SIZE
+    return offset * count // arc
+
+
+# ----------- private_ports : count free ports on 127.0.0.1 (the os picks them)
+def private_ports(count):
+    ports = []
+    socks = []
+    for _ in range(count):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(("127.0.0.1", 0))
+        socks.append(s)  # keep open until all are picked, so the same port is not given twice
+        ports.append(s.getsockname()[1])
+    for s in socks:
+        s.close()
+    return ports
+
+
+# ----------- supervise : start count workers of this server and keep them running
+# argv = the server's own arguments; every worker gets them plus its index and the private ports.
+# a worker that exits with 0 (15 min auto stop) stays down, any other exit is restarted.
+# returns 0 when all workers are down (TERM / ctrl+c stops them all, KILL for the ones still there
+# after grace seconds: workers finish their requests and save their keys first)
+# returns 1 when a worker keeps crashing right after its start (port in use, bad arguments, ...):
+# restarting it would never help, so the other workers are stopped too
+def supervise(script, argv, count, grace):
+    ports = private_ports(count)
+    port_text = ",".join(str(p) for p in ports)
+    stopping = [False]
+    status = 0
+
+    def start(w):
+        cmd = [sys.executable, script] + argv + ["--worker-index", str(w), "--worker-ports", port_text]
+        return subprocess.Popen(cmd)
+
+    def _stop(_signum, _frame):
+        stopping[0] = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    procs = []
+    started = []
+    delays = []
+    quick_fails = []  # crashes in a row, each before STABLE_AFTER
+    restart_at = []   # monotonic time a crashed worker is started again, None = running or done
+    for w in range(count):
+        procs.append(start(w))
+        started.append(time.monotonic())
+        delays.append(RESTART_DELAY)
+        quick_fails.append(0)
+        restart_at.append(None)
+    print("[supervisor] pid " + str(os.getpid()) + ", " + str(count) + " workers, private ports " + port_text,
+          flush=True)
+
+    while not stopping[0]:
+        now = time.monotonic()
+        alive = 0
+        for w in range(count):
+            if restart_at[w] is not None:
+                alive = alive + 1
+                if now >= restart_at[w]:
+                    procs[w] = start(w)
+                    started[w] = now
+                    restart_at[w] = None
+                continue
+            p = procs[w]
+            if p is None:
+                continue
+            code = p.poll()
+            if code is None:
+                alive = alive + 1
+                continue
+            procs[w] = None
+            if code == 0:
+                continue
+
+            # crashed: restart, slower and slower if it keeps crashing right away
+            if now - started[w] >= STABLE_AFTER:
+                delays[w] = RESTART_DELAY
+                quick_fails[w] = 0
+            quick_fails[w] = quick_fails[w] + 1
+            if quick_fails[w] >= MAX_QUICK_FAILS:
+                print("[supervisor] worker " + str(w) + " exited with " + str(code) + ", " + str(quick_fails[w]) +
+                      " times in a row within " + str(STABLE_AFTER) + "s of its start, giving up", flush=True)
+                status = 1
+                stopping[0] = True
+                break
+            print("[supervisor] worker " + str(w) + " exited with " + str(code) + ", restart in "
+                  + str(delays[w]) + "s", flush=True)
+            restart_at[w] = now + delays[w]
+            delays[w] = min(MAX_RESTART_DELAY, delays[w] * 2)
+            alive = alive + 1
+        if stopping[0]:
+            break
+        if alive == 0:
+            return 0
+        time.sleep(CHECK_INTERVAL)
+
+    # stop: TERM to all, KILL what is still there after grace
+    for p in procs:
+        if p is not None and p.poll() is None:
+            p.send_signal(signal.SIGTERM)
+    end = time.monotonic() + grace
+    for p in procs:
+        if p is None:
+            continue
+        try:
+            p.wait(timeout=max(0.0, end - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+    return status
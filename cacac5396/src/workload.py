@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# ------ workload.py
+# YCSB style workloads for bench.py: which keys are hot, read/write mix, value sizes
+# everything is generated before the timer starts (lists of ops), so the load loop only sends
+
+import random
+import string
+
+# YCSB core workloads (scan workload E is left out: the DHT API has no range reads)
+# read/update/insert/rmw = share of the operations, dist = key popularity
+PRESETS = {
+    "A": {"read": 0.50, "update": 0.50, "insert": 0.0, "rmw": 0.0, "dist": "zipfian"},  # update heavy
+    "B": {"read": 0.95, "update": 0.05, "insert": 0.0, "rmw": 0.0, "dist": "zipfian"},  # read mostly
+    "C": {"read": 1.00, "update": 0.00, "insert": 0.0, "rmw": 0.0, "dist": "zipfian"},  # read only
+    "D": {"read": 0.95, "update": 0.00, "insert": 0.05, "rmw": 0.0, "dist": "latest"},  # read latest
+    "F": {"read": 0.50, "update": 0.00, "insert": 0.0, "rmw": 0.50, "dist": "zipfian"}, # read-modify-write
+}
+
+KEY_DISTS = ("uniform", "zipfian", "latest")
+VALUE_DISTS = ("constant", "uniform", "zipfian")
+
+ZIPF_THETA = 0.99  # YCSB default skew
+
+
+# ----------- rand_text : random letters, built in one go (no string += in a loop)
+def rand_text(n, rng=random):
+    letters = string.ascii_letters + string.digits
+    return "".join(rng.choices(letters, k=n))
+
+
+# ----------- fnv_hash : spreads zipfian ranks over the key space (hot keys land on different nodes)
+def fnv_hash(i):
+    h = 0xCBF29CE484222325
+    for _ in range(8):
+        h = h ^ (i & 0xFF)
+        h = (h * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+        i = i >> 8
+    return h
+
+
+# ----------- Zipfian : ranks 0..n-1, rank 0 most popular (Gray et al. method, as in YCSB)
+# zeta(n) is a sum over all n items: computed once, then extended when n grows (inserts)
+class Zipfian:
+    def __init__(self, n, theta=ZIPF_THETA):
+        self.theta = theta
+        self.alpha = 1.0 / (1.0 - theta)
+        self.zeta2 = 1.0 + 0.5 ** theta
+        self.n = 0
+        self.zetan = 0.0
+        self.grow(n)
+
+    def grow(self, n):
+        # add the new items to zeta(n)
+        i = self.n + 1
+        total = self.zetan
+        while i <= n:
+            total = total + 1.0 / (i ** self.theta)
+            i = i + 1
+        self.zetan = total
+        self.n = n
+        if n <= 2:
+            # zeta(n) == zeta2 here (0 division below), and next() never gets past the zeta2 test
+            self.eta = 0.0
+        else:
+            self.eta = (1.0 - (2.0 / n) ** (1.0 - self.theta)) / (1.0 - self.zeta2 / self.zetan)
+
+    def next(self, rng):
+        u = rng.random()
+        uz = u * self.zetan
+        if uz < 1.0:
+            return 0
+        if uz < self.zeta2:
+            return 1
+        rank = int(self.n * (self.eta * u - self.eta + 1.0) ** self.alpha)
+        if rank >= self.n:
+            rank = self.n - 1
+        return rank
+
+
+# ----------- KeyChooser : index of the key to read/update among the records inserted so far
+class KeyChooser:
+    def __init__(self, dist, record_count):
+        if dist not in KEY_DISTS:
+            raise ValueError("unknown key distribution: " + dist)
+        self.dist = dist
+        self.count = record_count
+        self.zipf = None
+        if dist != "uniform":
+            self.zipf = Zipfian(record_count)
+
+    def inserted(self):
+        # one more record exists (workload D); zipf for "latest" follows the growing count
+        self.count = self.count + 1
+        if self.dist == "latest":
+            self.zipf.grow(self.count)
+
+    def next(self, rng):
+        if self.dist == "uniform":
+            return rng.randrange(self.count)
+        rank = self.zipf.next(rng)
+        if self.dist == "latest":
+            return self.count - 1 - rank           # newest records are the hot ones
+        return fnv_hash(rank) % self.count         # scrambled zipfian (hot keys spread over the ring)
+
+
+# ----------- SizeChooser : value size for each write
+class SizeChooser:
+    def __init__(self, dist, size, min_size=1):
+        if dist not in VALUE_DISTS:
+            raise ValueError("unknown value size distribution: " + dist)
+        self.dist = dist
+        self.size = size
+        self.min_size = min(min_size, size)
+        self.zipf = None
+        if dist == "zipfian":
+            self.zipf = Zipfian(size - self.min_size + 1)
+
+    def next(self, rng):
+        if self.dist == "constant":
+            return self.size
+        if self.dist == "uniform":
+            return rng.randint(self.min_size, self.size)
+        return self.min_size + self.zipf.next(rng)  # small values most common
+
+
+# ----------- ValuePool : values are slices of one random text (no per value generation cost)
+class ValuePool:
+    def __init__(self, max_size, rng=random):
+        self.text = rand_text(max_size + 4096, rng)
+
+    def value(self, size, rng):
+        start = rng.randrange(4096)
+        return self.text[start:start + size]
+
+
+# ----------- key_name : record i of run r
+def key_name(run_idx, i):
+    return "user" + str(run_idx) + "_" + str(i)
+
+
+# ----------- build_load : the PUTs that create the first record_count records
+def build_load(run_idx, record_count, sizes, pool, rng):
+    ops = []
+    for i in range(record_count):
+        ops.append(("PUT", key_name(run_idx, i), pool.value(sizes.next(rng), rng)))
+    return ops
+
+
+# ----------- build_run : op_count mixed ops following spec (a PRESETS entry or the same shape)
+# kinds: READ (GET), UPDATE (PUT existing), INSERT (PUT new), RMW (GET then PUT same key)
+def build_run(spec, run_idx, record_count, op_count, sizes, pool, rng):
+    keys = KeyChooser(spec["dist"], record_count)
+    shares = [("READ", spec["read"]), ("UPDATE", spec["update"]), ("INSERT", spec["insert"]), ("RMW", spec["rmw"])]
+    total = 0.0
+    for _, p in shares:
+        total = total + p
+    if total <= 0:
+        raise ValueError("workload has no operations")
+
+    ops = []
+    for _ in range(op_count):
+        pick = rng.random() * total
+        kind = shares[-1][0]
+        for name, p in shares:
+            if pick < p:
+                kind = name
+                break
+            pick = pick - p
+
+        # note: with parallel workers a READ of one of the newest keys can be sent before its INSERT
+        # is done (shows as a failed READ), same as YCSB without its acknowledged-insert counter
+        if kind == "INSERT":
+            ops.append((kind, key_name(run_idx, keys.count), pool.value(sizes.next(rng), rng)))
+            keys.inserted()
+        elif kind == "READ":
+            ops.append((kind, key_name(run_idx, keys.next(rng)), None))
+        else:
+            ops.append((kind, key_name(run_idx, keys.next(rng)), pool.value(sizes.next(rng), rng)))
+    return ops